@@ -25,11 +25,14 @@ def question_1():
     qry = """
         SELECT
             cr.CustomerClass,
-            AVG(TRY_CAST(TRIM(c.Income) AS DOUBLE)) AS AverageIncome
+            AVG(c.Income) AS AverageIncome
         FROM credit AS cr
-        JOIN customers AS c
+        JOIN (
+            SELECT CustomerID, TRY_CAST(TRIM(Income) AS DOUBLE) AS Income -- Clean Income once per customer row
+            FROM customers
+        ) AS c
             USING (CustomerID)
-        WHERE TRY_CAST(TRIM(c.Income) AS DOUBLE) IS NOT NULL
+        WHERE c.Income IS NOT NULL
         GROUP BY cr.CustomerClass
         ORDER BY cr.CustomerClass
         
@@ -47,17 +50,28 @@ def question_2():
     qry = """
     
     --1. Normalise the Region field from customers table to a consistent province name using CASE argument
+    --   (the cleaned region is computed once per row and compared against each spelling)
     SELECT
-        CASE 
-            WHEN UPPER(TRIM(c.Region)) IN ('LP', 'LIMPOPO') THEN 'Limpopo'
-            WHEN UPPER(TRIM(c.Region)) IN ('MP', 'MPUMALANGA') THEN 'Mpumalanga'
-            WHEN UPPER(TRIM(c.Region)) IN ('GT', 'GAUTENG') THEN 'Gauteng'
-            WHEN UPPER(TRIM(c.Region)) IN ('KZN', 'KWAZULU-NATAL', 'KWAZULU NATAL') THEN 'KwaZulu-Natal'
-            WHEN UPPER(TRIM(c.Region)) IN ('NW', 'NORTH WEST') THEN 'NorthWest'
-            WHEN UPPER(TRIM(c.Region)) IN ('EC', 'EASTERN CAPE') THEN 'EasternCape'
-            WHEN UPPER(TRIM(c.Region)) IN ('WC', 'WESTERN CAPE') THEN 'WesternCape'
-            WHEN UPPER(TRIM(c.Region)) IN ('NC', 'NORTHERN CAPE') THEN 'NorthernCape'
-            WHEN UPPER(TRIM(c.Region)) IN ('FS', 'FREE STATE') THEN 'FreeState'
+        CASE UPPER(TRIM(c.Region))
+            WHEN 'LP' THEN 'Limpopo'
+            WHEN 'LIMPOPO' THEN 'Limpopo'
+            WHEN 'MP' THEN 'Mpumalanga'
+            WHEN 'MPUMALANGA' THEN 'Mpumalanga'
+            WHEN 'GT' THEN 'Gauteng'
+            WHEN 'GAUTENG' THEN 'Gauteng'
+            WHEN 'KZN' THEN 'KwaZulu-Natal'
+            WHEN 'KWAZULU-NATAL' THEN 'KwaZulu-Natal'
+            WHEN 'KWAZULU NATAL' THEN 'KwaZulu-Natal'
+            WHEN 'NW' THEN 'NorthWest'
+            WHEN 'NORTH WEST' THEN 'NorthWest'
+            WHEN 'EC' THEN 'EasternCape'
+            WHEN 'EASTERN CAPE' THEN 'EasternCape'
+            WHEN 'WC' THEN 'WesternCape'
+            WHEN 'WESTERN CAPE' THEN 'WesternCape'
+            WHEN 'NC' THEN 'NorthernCape'
+            WHEN 'NORTHERN CAPE' THEN 'NorthernCape'
+            WHEN 'FS' THEN 'FreeState'
+            WHEN 'FREE STATE' THEN 'FreeState'
             ELSE TRIM(c.Region)
         END AS Province,
         COUNT(*) AS RejectedApplications
@@ -130,19 +144,44 @@ def question_4():
 
     qry = """
 
-    CREATE TABLE IF NOT EXISTS timeline AS --Create the timeline table if it does not exist yet
+    CREATE OR REPLACE TABLE timeline AS --Create (or rebuild) the timeline table
+
+    --1. Map each TimeZone abbreviation in the repayments to its zone (the abbreviations are Java's short zone ids)
+    WITH zones AS (
+        SELECT *
+        FROM (VALUES
+            ('UTC', 'UTC'),
+            ('GMT', 'GMT'),
+            ('CET', 'CET'),
+            ('EET', 'EET'),
+            ('IST', 'Asia/Kolkata'),
+            ('JST', 'Asia/Tokyo'),
+            ('PST', 'America/Los_Angeles'),
+            ('PNT', 'America/Phoenix'),
+            ('CST', 'America/Chicago')
+        ) AS z(TimeZone, ZoneName)
+    ),
 
-    --1. Clean Raw Repayment Data
-    WITH cleaned AS (
+    --2. Clean Raw Repayment Data - convert each repayment time from its own zone to London time, with daylight saving
+    --   applied on both sides
+    london AS (
         SELECT
             r.CustomerID,
-            EXTRACT(MONTH FROM r.RepaymentDate) AS MonthID, -- Extract month number ofrom repayment date
-            TRY_CAST(TRIM(r.Amount) AS DOUBLE) AS Amount,
-            EXTRACT(HOUR FROM r.RepaymentDate) AS Hour24
+            r.Amount,
+            timezone('Europe/London', timezone(z.ZoneName, r.RepaymentDate)) AS RepaymentDateLondon
         FROM repayments r
+        LEFT JOIN zones z USING (TimeZone)
+    ),
+    cleaned AS (
+        SELECT
+            CustomerID,
+            EXTRACT(MONTH FROM RepaymentDateLondon) AS MonthID, -- Month number of the repayment in London time
+            TRY_CAST(TRIM(Amount) AS DOUBLE) AS Amount,
+            EXTRACT(HOUR FROM RepaymentDateLondon) AS Hour24     -- Hour of the repayment in London time
+        FROM london
     ),
 
-    --2. Filter Repayments to business hours
+    --3. Filter Repayments to business hours
     filtered AS (
         SELECT
             CustomerID,
@@ -154,7 +193,7 @@ def question_4():
         GROUP BY CustomerID, MonthID
     )
 
-    --3. Use Cross Join to generate a full timeline that ensures 12 months per customer
+    --4. Use Cross Join to generate a full timeline that ensures 12 months per customer
     SELECT
         c.CustomerID,
         m.MonthName,
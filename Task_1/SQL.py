@@ -82,18 +82,6 @@ def question_3():
 
     qry = """
 
-    --Clean the query by removing the duplicate customer ID's 
-    WITH unique_customers AS (
-        SELECT *
-        FROM (
-            SELECT
-                *,
-                ROW_NUMBER() OVER (PARTITION BY CustomerID ORDER BY Name) AS rn
-            FROM customers
-        )
-        WHERE rn = 1 -- Keep only the first occurrence per CustomerID
-    )
-    
     SELECT
         LoanTerm,
         COUNT(*) AS TotalLoans,
@@ -0,0 +1,148 @@
+import contextlib
+import fcntl
+import os
+import shutil
+import tempfile
+
+import duckdb
+
+from database_load import data_file_path, database_path, load_database, table_sources
+
+"""
+Baseline snapshot of loan.db for resetting the database between question sections.
+
+The questions change the database (SQL.py question_5 updates credit, Advanced_SQL.py creates financing, timeline and
+corrected_customers). Instead of rebuilding loan.db from the csv files, a pristine baseline is loaded once into
+loan.snapshot.db (refreshed only when a source file changes) and every reset clones it:
+    - reset_database() puts a copy of the baseline in place of loan.db,
+    - isolated_database() gives a run or test its own throwaway copy, either a cloned file or an in-memory database.
+Files are cloned copy-on-write (a reflink) where the filesystem supports it and copied otherwise. The snapshot is
+validated against the source files (by hash, see load_database) the first time it is used in a process; after that a
+reset only compares the size and modification time of the snapshot and source files before copying.
+
+Usage (from the Task_1 folder):
+    python database/snapshot.py          # reset loan.db to the baseline
+
+"""
+
+snapshot_path = os.path.join(os.path.dirname(__file__), 'loan.snapshot.db')
+
+# ioctl request that makes a file share another file's extents (Linux FICLONE, supported by Btrfs, XFS, ...)
+FICLONE = 0x40049409
+
+# (snapshot path, data folder) -> file_stamps() of the snapshot and its source files when it was last validated
+validated_stamps = {}
+
+
+
+
+def clone_file(source, destination):
+    "function to copy a file as a copy-on-write clone where the filesystem supports it, and as a plain copy otherwise"
+    with open(source, 'rb') as src, open(destination, 'wb') as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            return
+        except OSError:
+            pass
+        shutil.copyfileobj(src, dst, 1 << 20)
+
+
+
+
+def file_stamps(snapshot_path=snapshot_path, data_dir=None):
+    "function to get the (size, mtime) of the snapshot and of every source file, None for a missing file"
+    stamps = []
+    for path in [snapshot_path] + [data_file_path(filename, data_dir) for _, filename in table_sources.values()]:
+        try:
+            stat = os.stat(path)
+            stamps.append((stat.st_size, stat.st_mtime_ns))
+        except FileNotFoundError:
+            stamps.append(None)
+    return tuple(stamps)
+
+
+
+
+def create_snapshot(snapshot_path=snapshot_path, data_dir=None):
+    "function to load the baseline snapshot, or refresh it when a source file changed (see load_database)"
+    report = load_database(snapshot_path, data_dir, incremental=True)
+    validated_stamps[(os.path.abspath(snapshot_path), data_dir)] = file_stamps(snapshot_path, data_dir)
+    return report
+
+
+
+
+def ensure_snapshot(snapshot_path=snapshot_path, data_dir=None):
+    "function to create or refresh the snapshot unless it was validated and no file's size or mtime changed since"
+    if validated_stamps.get((os.path.abspath(snapshot_path), data_dir)) != file_stamps(snapshot_path, data_dir):
+        create_snapshot(snapshot_path, data_dir)
+
+
+
+
+def reset_database(database_path=database_path, snapshot_path=snapshot_path, data_dir=None):
+    "function to replace the database with a copy of the baseline snapshot"
+    ensure_snapshot(snapshot_path, data_dir)
+
+    tmp_path = f'{database_path}.{os.getpid()}.restore'
+    clone_file(snapshot_path, tmp_path)
+    os.replace(tmp_path, database_path)
+    if os.path.exists(database_path + '.wal'):
+        os.remove(database_path + '.wal')
+
+
+
+
+def memory_copy(snapshot_path=snapshot_path):
+    "function to open an in-memory database holding a copy of every table and view of the snapshot"
+    cursor = duckdb.connect()
+    cursor.execute(f"ATTACH '{snapshot_path.replace(chr(39), chr(39) * 2)}' AS baseline (READ_ONLY)")
+
+    tables = cursor.execute(
+        "SELECT table_name FROM duckdb_tables() WHERE database_name = 'baseline' AND NOT internal"
+    ).fetchall()
+    for (table,) in tables:
+        cursor.execute(f'CREATE TABLE memory.main."{table}" AS SELECT * FROM baseline.main."{table}"')
+
+    views = cursor.execute(
+        "SELECT sql FROM duckdb_views() WHERE database_name = 'baseline' AND NOT internal"
+    ).fetchall()
+    cursor.execute('DETACH baseline')
+    for (sql,) in views:
+        cursor.execute(sql)
+    return cursor
+
+
+
+
+@contextlib.contextmanager
+def isolated_database(snapshot_path=snapshot_path, in_memory=False, data_dir=None):
+    """function to give a run its own copy of the baseline, discarded afterwards
+
+    Yields an open connection: to an in-memory copy with in_memory=True, otherwise to a cloned file in a
+    temporary folder.
+    """
+    ensure_snapshot(snapshot_path, data_dir)
+
+    if in_memory:
+        cursor = memory_copy(snapshot_path)
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'loan.db')
+        clone_file(snapshot_path, path)
+        cursor = duckdb.connect(path)
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+
+
+
+
+if __name__ == '__main__':
+    reset_database()
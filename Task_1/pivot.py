@@ -0,0 +1,163 @@
+import datetime
+
+"""
+One-pass pivot of repayments into a wide per-customer summary.
+
+'question_4()' and 'question_5()' in Advanced_SQL.py build the wide view in two steps: a dense customers x months
+`timeline` table, then a PIVOT over it with 24 hand written casts. 'pivot_qry()' generates the wide query directly from
+`repayments` instead: every repayment is assigned an integer bucket number once, and each period's count and total are
+conditional aggregates over that number, so `repayments` is scanned once and no customers x periods table is ever built.
+The conditional aggregates are written as SUM(CASE ...) rather than FILTER clauses, which DuckDB evaluates far faster
+once there are hundreds of periods.
+
+Buckets are calendar months, ISO weeks (starting Monday) or days of the London time of each repayment (the
+`RepaymentDateLondon` column added by the loader). Each period gets a `<Period>_Repayments` INTEGER column and a
+`<Period>_Total` DOUBLE column, e.g. `Month_2024_01_Repayments`, `Week_2024_01_01_Total` or `Day_2024_03_31_Total`.
+
+"""
+
+GRANULARITIES = ("month", "week", "day")
+
+
+def period_starts(start, end, granularity="month"):
+    """
+    List the first day of every period overlapping [start, end).
+
+    Args:
+        start (date): First day of the range
+        end (date): Day after the last day of the range
+        granularity (str): 'month', 'week' or 'day'
+
+    Returns:
+        list[date]: Period start dates in order.
+
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {GRANULARITIES}, got '{granularity}'")
+
+    if granularity == "month":
+        period = start.replace(day=1)
+    elif granularity == "week":
+        period = start - datetime.timedelta(days=start.weekday())
+    else:
+        period = start
+
+    periods = []
+    while period < end:
+        periods.append(period)
+        if granularity == "month":
+            period = (period.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+        else:
+            period += datetime.timedelta(days=7 if granularity == "week" else 1)
+    return periods
+
+
+def period_label(period, granularity="month"):
+    """
+    Column prefix of a period, e.g. 'Month_2024_01' or 'Day_2024_01_31'.
+    """
+    if granularity == "month":
+        return f"Month_{period:%Y_%m}"
+    return f"{granularity.capitalize()}_{period:%Y_%m_%d}"
+
+
+def bucket_expression(first_period, granularity, time_column):
+    """
+    SQL expression numbering the period of 'time_column', 0 for the period starting at 'first_period'.
+    """
+    if granularity == "month":
+        return (
+            f"(YEAR({time_column}) - {first_period.year}) * 12 + MONTH({time_column}) - {first_period.month}"
+        )
+    days = f"DATE_DIFF('day', DATE '{first_period:%Y-%m-%d}', CAST({time_column} AS DATE))"
+    return f"{days} // 7" if granularity == "week" else days
+
+
+def pivot_qry(start, end, granularity="month", hours=(6, 18), time_column="RepaymentDateLondon", all_customers=True):
+    """
+    Generate the wide repayment summary query.
+
+    Args:
+        start (date): First day of the range
+        end (date): Day after the last day of the range
+        granularity (str): 'month', 'week' or 'day'
+        hours (tuple[int, int]): Inclusive range of London hours repayments are counted in (as in 'question_4()'),
+            or None for every hour
+        time_column (str): Timestamp column of `repayments` the periods are taken from
+        all_customers (bool): Include customers without repayments in the range (with zero counts and totals)
+
+    Returns:
+        str: SQL returning one row per CustomerID with a count and a total column per period.
+
+    """
+    periods = period_starts(start, end, granularity)
+    if not periods:
+        raise ValueError("The range does not contain any period")
+
+    conditions = [f"{time_column} >= TIMESTAMP '{start:%Y-%m-%d}'", f"{time_column} < TIMESTAMP '{end:%Y-%m-%d}'"]
+    if hours is not None:
+        conditions.append(f"LondonHour BETWEEN {int(hours[0])} AND {int(hours[1])}")
+
+    columns = []
+    for bucket, period in enumerate(periods):
+        label = period_label(period, granularity)
+        columns.append(
+            f"CAST(SUM(CASE WHEN r.Bucket = {bucket} THEN 1 ELSE 0 END) AS INTEGER) AS {label}_Repayments"
+        )
+        columns.append(f"SUM(CASE WHEN r.Bucket = {bucket} THEN r.Amount ELSE 0 END) AS {label}_Total")
+    columns = ",\n        ".join(columns)
+
+    # Customers without repayments come from a plain scan of customers, not from a cross product with the periods
+    source = (
+        "(SELECT DISTINCT CustomerID FROM customers) AS c LEFT JOIN filtered AS r USING (CustomerID)"
+        if all_customers
+        else "filtered AS r"
+    )
+
+    qry = f"""
+
+    --1. Bucket number and amount of every repayment in the range, computed once per row
+    WITH filtered AS (
+        SELECT
+            CustomerID,
+            {bucket_expression(periods[0], granularity, time_column)} AS Bucket,
+            TRY_CAST(Amount AS DOUBLE) AS Amount
+        FROM repayments
+        WHERE {" AND ".join(conditions)}
+    )
+
+    --2. One conditional count and total per period
+    SELECT
+        CustomerID,
+        {columns}
+    FROM {source}
+    GROUP BY CustomerID
+    ORDER BY CustomerID
+    """
+
+    return qry
+
+
+def data_range(cursor, time_column="RepaymentDateLondon"):
+    """
+    Return the (first day, day after the last day) of the repayments in the database.
+    """
+    first, last = cursor.execute(
+        f"SELECT CAST(MIN({time_column}) AS DATE), CAST(MAX({time_column}) AS DATE) FROM repayments"
+    ).fetchall()[0]
+    return first, last + datetime.timedelta(days=1)
+
+
+def run_pivot(cursor, start=None, end=None, granularity="month", **kwargs):
+    """
+    Run 'pivot_qry()' on a connection, defaulting the range to the repayments in the database.
+
+    Returns:
+        DataFrame: The wide summary.
+
+    """
+    if start is None or end is None:
+        first, after_last = data_range(cursor, kwargs.get("time_column", "RepaymentDateLondon"))
+        start = first if start is None else start
+        end = after_last if end is None else end
+    return cursor.execute(pivot_qry(start, end, granularity, **kwargs)).df()
@@ -0,0 +1,210 @@
+import importlib
+import inspect
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+
+import duckdb
+
+from database.database_load import database_path
+
+"""
+Instrumented runner for the `question_N()` functions in SQL.py and Advanced_SQL.py.
+
+Every `question_*` function is discovered, its query is executed against loan.db over one reused connection and, with
+profiling enabled, DuckDB's JSON profile is captured next to the wall time and the number of rows produced. The profile
+gives the physical plan as a tree and a flat list of operators with their own timings, so the most expensive queries and
+operators can be found without pasting queries into Check_your_SQL.ipynb.
+
+NOTE: questions that change the database (e.g. the UPDATE in SQL.py question_5) change loan.db as they do in the
+notebook; run 'python database/database_load.py' to reset it.
+
+Usage (from the Task_1 folder):
+    python query_runner.py [SQL] [Advanced_SQL] [--output profile.json]
+
+"""
+
+QUESTION_MODULES = ("SQL", "Advanced_SQL")
+
+
+@dataclass
+class QueryProfile:
+    """
+    Measurements of one question's query.
+
+    Attributes:
+        module (str): Name of the module the question is defined in
+        question (str): Name of the question function
+        wall_s (float): Wall time of executing the query and fetching its result
+        rows (int): Number of rows in the result
+        operators (list[dict]): Physical operators in plan order with their name, depth, timing and cardinality
+        plan (dict): DuckDB's JSON profile (the physical plan tree), or None when profiling is disabled
+    """
+
+    module: str
+    question: str
+    wall_s: float
+    rows: int
+    operators: list = field(default_factory=list)
+    plan: dict = None
+
+    def slowest_operators(self, n=3):
+        """
+        Return the 'n' operators with the highest timing.
+        """
+        return sorted(self.operators, key=lambda operator: operator["timing"], reverse=True)[:n]
+
+
+def question_number(name):
+    """
+    Sort key putting 'question_10' after 'question_9'.
+    """
+    match = re.search(r"(\d+)$", name)
+    return (int(match.group(1)) if match else 0, name)
+
+
+def discover_questions(module):
+    """
+    Find the `question_*` functions of a module.
+
+    Args:
+        module (module | str): Question module or its name, e.g. 'Advanced_SQL'
+
+    Returns:
+        list[tuple[str, function]]: (name, function) pairs in question order.
+
+    """
+    if isinstance(module, str):
+        module = importlib.import_module(module)
+
+    questions = [
+        (name, function) for name, function in inspect.getmembers(module, inspect.isfunction)
+        if name.startswith("question_") and function.__module__ == module.__name__
+    ]
+    return sorted(questions, key=lambda question: question_number(question[0]))
+
+
+def flatten_operators(plan, depth=0):
+    """
+    Flatten DuckDB's JSON profile tree into a list of operators (the root 'Query' node is skipped).
+    """
+    operators = []
+    for child in plan.get("children", []):
+        operators.append(
+            {
+                "name": child["name"].strip(),
+                "depth": depth,
+                "timing": child.get("timing", 0.0),
+                "cardinality": child.get("cardinality", 0),
+                "extra_info": child.get("extra_info", "").strip(),
+            }
+        )
+        operators.extend(flatten_operators(child, depth + 1))
+    return operators
+
+
+def run_query(cursor, qry, profile_path=None):
+    """
+    Execute a query and fetch its result, optionally with DuckDB's JSON profiling written to 'profile_path'.
+
+    Returns:
+        tuple[DataFrame, float, dict]: The result, the wall time and the profile (None without 'profile_path').
+
+    """
+    if profile_path is not None:
+        cursor.execute("PRAGMA enable_profiling='json'")
+        cursor.execute(f"PRAGMA profiling_output='{profile_path}'")
+
+    try:
+        start = time.perf_counter()
+        result = cursor.execute(qry).df()
+        wall_s = time.perf_counter() - start
+    finally:
+        if profile_path is not None:
+            cursor.execute("PRAGMA disable_profiling")
+
+    plan = None
+    if profile_path is not None and os.path.exists(profile_path):
+        with open(profile_path) as f:
+            plan = json.load(f)
+    return result, wall_s, plan
+
+
+def run_questions(modules=QUESTION_MODULES, database_path=database_path, profile=True):
+    """
+    Run every question of the given modules over one connection.
+
+    Args:
+        modules (iterable): Question modules or module names
+        database_path (str): Database the questions are run against
+        profile (bool): Capture DuckDB's profile (operator timings and physical plan) for each question
+
+    Returns:
+        list[QueryProfile]: One entry per question, in module and question order.
+
+    """
+    profiles = []
+    with tempfile.TemporaryDirectory() as tmp_dir, duckdb.connect(database_path) as cursor:
+        profile_path = os.path.join(tmp_dir, "profile.json") if profile else None
+
+        # The first DataFrame fetch pays for importing pandas; keep it out of the first question's wall time
+        cursor.execute("SELECT 1").df()
+
+        for module in modules:
+            module_name = module if isinstance(module, str) else module.__name__
+            for name, function in discover_questions(module):
+                if profile_path is not None and os.path.exists(profile_path):
+                    os.remove(profile_path)
+
+                result, wall_s, plan = run_query(cursor, function(), profile_path)
+                profiles.append(
+                    QueryProfile(
+                        module=module_name,
+                        question=name,
+                        wall_s=wall_s,
+                        rows=len(result),
+                        operators=flatten_operators(plan) if plan else [],
+                        plan=plan,
+                    )
+                )
+    return profiles
+
+
+def write_report(profiles, path):
+    """
+    Write the profiles to 'path' as JSON.
+    """
+    with open(path, "w") as f:
+        json.dump([asdict(profile) for profile in profiles], f, indent=2)
+
+
+def format_summary(profiles, n_operators=3):
+    """
+    Summarise the profiles as text, most expensive question first.
+    """
+    lines = []
+    for profile in sorted(profiles, key=lambda profile: profile.wall_s, reverse=True):
+        lines.append(f"{profile.module}.{profile.question}: {profile.wall_s * 1000:.1f} ms, {profile.rows} rows")
+        for operator in profile.slowest_operators(n_operators):
+            lines.append(
+                f"    {operator['name']}: {operator['timing'] * 1000:.1f} ms, {operator['cardinality']} rows"
+            )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    output_path = None
+    if "--output" in args:
+        index = args.index("--output")
+        output_path = args[index + 1]
+        del args[index:index + 2]
+
+    profiles = run_questions(args or QUESTION_MODULES)
+    print(format_summary(profiles))
+    if output_path:
+        write_report(profiles, output_path)
@@ -0,0 +1,206 @@
+import asyncio
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import duckdb
+
+from database.database_load import database_path
+from query_runner import QUESTION_MODULES, discover_questions
+from result_cache import ResultCache, is_mutating
+
+"""
+Asyncio query service for loan.db.
+
+One read-only DuckDB connection is opened per service and a fixed pool of cursors is created from it, so every query
+shares the same database instance (buffer pool, catalog and metadata) instead of paying for a 'duckdb.connect' per
+caller. Queries run on a bounded thread pool, one cursor per worker; DuckDB releases the GIL while it executes, so
+concurrent queries run in parallel.
+
+Every query can have a timeout. A query that times out or whose task is cancelled is interrupted inside DuckDB
+('cursor.interrupt()') and its cursor goes back to the pool.
+
+The connection is read only, so queries that change the database (e.g. the UPDATE in SQL.py question_5 or the CREATE
+TABLE statements in Advanced_SQL.py) are rejected with a ValueError before they run, and 'run_questions()' leaves those
+questions out unless asked for them; use 'query_runner.py' to run them.
+
+With 'cache_bytes' set, results are served from a 'ResultCache' (see result_cache.py) until the database changes.
+
+Usage:
+    async with QueryService() as service:
+        result = await service.run(SQL.question_1(), timeout=5)
+        results = await service.run_questions(['SQL'])
+
+"""
+
+RESULT_FORMATS = ("pandas", "arrow")
+
+
+class _Job:
+    """
+    One query's cursor and cancellation state, shared between the event loop and the worker thread.
+    """
+
+    def __init__(self):
+        self.cursor = None
+        self.cancelled = False
+        self.lock = threading.Lock()
+
+    def start(self, cursor):
+        with self.lock:
+            if self.cancelled:
+                return False
+            self.cursor = cursor
+            return True
+
+    def finish(self):
+        with self.lock:
+            self.cursor = None
+
+    def cancel(self):
+        with self.lock:
+            self.cancelled = True
+            if self.cursor is not None:
+                self.cursor.interrupt()
+
+
+class QueryService:
+    """
+    Runs queries concurrently on a pool of read-only cursors of one database.
+
+    Args:
+        database_path (str): Database to query
+        max_workers (int): Number of cursors and worker threads, i.e. the number of queries running at once
+            (defaults to the number of CPUs)
+        timeout (float): Default per-query timeout in seconds (None waits indefinitely)
+        threads (int): Optional number of DuckDB threads per query
+        cache_bytes (int): Size of the result cache in bytes (None disables caching)
+    """
+
+    def __init__(self, database_path=database_path, max_workers=None, timeout=None, threads=None, cache_bytes=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.cache = None if cache_bytes is None else ResultCache(database_path, cache_bytes)
+
+        config = {} if threads is None else {"threads": threads}
+        self._connection = duckdb.connect(database_path, read_only=True, config=config)
+
+        # DuckDB imports pandas and pyarrow on the first fetch; doing that concurrently from the worker threads can
+        # deadlock on the import lock, so both are imported here first
+        self._connection.execute("SELECT 1").df()
+        self._connection.execute("SELECT 1").fetch_arrow_table()
+
+        self._cursors = queue.SimpleQueue()
+        for _ in range(self.max_workers):
+            self._cursors.put(self._connection.cursor())
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="query-service")
+
+    def _execute(self, job, qry, parameters, result_format):
+        # Runs on a worker thread; there are as many cursors as workers, so a cursor is always free
+        cursor = self._cursors.get()
+        try:
+            if not job.start(cursor):
+                raise asyncio.CancelledError()
+            if self.cache is not None:
+                return self.cache.execute(cursor, qry, parameters, result_format)
+            result = cursor.execute(qry, parameters or [])
+            return result.fetch_arrow_table() if result_format == "arrow" else result.df()
+        finally:
+            job.finish()
+            self._cursors.put(cursor)
+
+    async def run(self, qry, parameters=None, timeout=None, result_format="pandas"):
+        """
+        Run one query.
+
+        Args:
+            qry (str): SQL text, e.g. 'SQL.question_1()'
+            parameters (list): Optional prepared statement parameters
+            timeout (float): Seconds before the query is interrupted (defaults to the service timeout)
+            result_format (str): 'pandas' for a DataFrame or 'arrow' for an Arrow table
+
+        Returns:
+            DataFrame | Table: The query result.
+
+        Raises:
+            TimeoutError: The query did not finish within the timeout and was interrupted.
+            ValueError: The query changes the database, which the service's read-only connection cannot do.
+
+        """
+        if result_format not in RESULT_FORMATS:
+            raise ValueError(f"result_format must be one of {RESULT_FORMATS}, got '{result_format}'")
+        if is_mutating(qry):
+            raise ValueError(
+                "The query changes the database, but the service's connection is read only; run it with query_runner.py"
+            )
+
+        job = _Job()
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, self._execute, job, qry, parameters, result_format)
+        try:
+            return await asyncio.wait_for(future, timeout if timeout is not None else self.timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            # Stop the query inside DuckDB (or stop it from starting) so its worker and cursor are freed
+            job.cancel()
+            raise
+
+    async def run_many(self, queries, timeout=None, result_format="pandas"):
+        """
+        Run several queries concurrently.
+
+        Args:
+            queries (dict): Name to SQL text
+            timeout (float): Per-query timeout in seconds (defaults to the service timeout)
+            result_format (str): 'pandas' or 'arrow'
+
+        Returns:
+            dict: Name to result, or to the exception the query raised (e.g. TimeoutError), in the order of 'queries'.
+
+        """
+        results = await asyncio.gather(
+            *(self.run(qry, timeout=timeout, result_format=result_format) for qry in queries.values()),
+            return_exceptions=True,
+        )
+        return dict(zip(queries, results))
+
+    async def run_questions(
+        self, modules=QUESTION_MODULES, timeout=None, result_format="pandas", include_mutating=False
+    ):
+        """
+        Run every read-only `question_*` function of the given modules concurrently.
+
+        Args:
+            modules (iterable): Question modules or module names
+            timeout (float): Per-query timeout in seconds (defaults to the service timeout)
+            result_format (str): 'pandas' or 'arrow'
+            include_mutating (bool): Also list the questions that change the database, each with the ValueError
+                'run()' rejects it with
+
+        Returns:
+            dict: '<module>.<question>' to its result or exception, see 'run_many()'.
+
+        """
+        queries = {}
+        for module in modules:
+            module_name = module if isinstance(module, str) else module.__name__
+            for name, function in discover_questions(module):
+                qry = function()
+                if include_mutating or not is_mutating(qry):
+                    queries[f"{module_name}.{name}"] = qry
+        return await self.run_many(queries, timeout=timeout, result_format=result_format)
+
+    def close(self):
+        """
+        Wait for running queries, then close the cursors and the connection.
+        """
+        self._executor.shutdown(wait=True)
+        while not self._cursors.empty():
+            self._cursors.get().close()
+        self._connection.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
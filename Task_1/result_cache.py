@@ -0,0 +1,319 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+
+"""
+In-memory result cache for the question queries.
+
+Results are keyed by the normalized SQL text (comments and whitespace removed), the query parameters and the result
+format, and are evicted least recently used first once their total size exceeds a byte budget.
+
+Every entry records the tables it read (views are expanded to the tables they select from). Only read-only statements
+(SELECT, WITH ... SELECT, FROM, VALUES, TABLE, DESCRIBE, SHOW, SUMMARIZE, EXPLAIN) are cached. A query that writes to
+the database (UPDATE, INSERT, DELETE, CREATE, DROP, ALTER, ...) is executed and then invalidates the entries that read
+any table it writes; any other statement (SET, PRAGMA, CALL, CHECKPOINT, ATTACH, IMPORT DATABASE, ...) may change the
+database or the session in ways the cache cannot track, so it clears the whole cache. Queries calling non-deterministic
+functions (random(), now(), current_date, ...) run every time and are never stored. A result whose query was running
+while one of its tables was invalidated is returned but not stored. Changes made outside the cache (e.g. the loader
+replacing loan.db) are caught by a database version stamp - the identity, size and modification time of the database
+file and its WAL - and clear the whole cache.
+
+Usage:
+    cache = ResultCache(database_path)
+    with duckdb.connect(database_path) as cursor:
+        result = cache.execute(cursor, SQL.question_1())
+
+"""
+
+DEFAULT_MAX_BYTES = 256 * 2**20
+
+# Strings, quoted identifiers and comments, matched in one pass so that '--' inside a string is not a comment
+_LEXER = re.compile(r"""('(?:[^']|'')*')|("(?:[^"]|"")*")|(--[^\n]*)|(/\*.*?\*/)""", re.DOTALL)
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+READ_ONLY_KEYWORDS = ("SELECT", "FROM", "VALUES", "TABLE", "DESCRIBE", "SHOW", "SUMMARIZE", "EXPLAIN")
+MUTATING_KEYWORDS = ("INSERT", "UPDATE", "DELETE", "CREATE", "DROP", "ALTER", "COPY", "TRUNCATE")
+
+# Functions (and sampling clauses) whose result differs between executions of the same query
+NONDETERMINISTIC_NAMES = frozenset(
+    {
+        "random", "setseed", "uuid", "gen_random_uuid", "nextval", "currval", "now", "today", "current_date",
+        "current_time", "current_timestamp", "get_current_time", "get_current_timestamp", "localtime", "localtimestamp",
+        "transaction_timestamp", "sample", "tablesample",
+    }
+)
+
+# Table written by a mutating statement (the name after the keywords)
+_WRITTEN_TABLE = re.compile(
+    r"""^(?:
+        INSERT\s+(?:OR\s+\w+\s+)?INTO
+        | UPDATE
+        | DELETE\s+FROM
+        | TRUNCATE(?:\s+TABLE)?
+        | ALTER\s+(?:TABLE|VIEW)
+        | DROP\s+(?:TABLE|VIEW)(?:\s+IF\s+EXISTS)?
+        | CREATE(?:\s+OR\s+REPLACE)?(?:\s+TEMP|\s+TEMPORARY)?\s+(?:TABLE|VIEW)(?:\s+IF\s+NOT\s+EXISTS)?
+    )\s+"?([A-Za-z_][A-Za-z0-9_]*)"?""",
+    re.IGNORECASE | re.VERBOSE,
+)
+
+
+def normalize_sql(qry):
+    """
+    Remove comments, collapse whitespace and drop trailing semicolons, keeping string literals intact.
+    """
+    tokens = []
+    position = 0
+    for match in _LEXER.finditer(qry):
+        tokens.extend(qry[position:match.start()].split())
+        if match.group(1) or match.group(2):
+            tokens.append(match.group(0))
+        position = match.end()
+    tokens.extend(qry[position:].split())
+    return " ".join(tokens).strip("; ")
+
+
+def split_statements(qry):
+    """
+    Split normalized SQL into its statements.
+    """
+    statements, start = [], 0
+    for match in re.finditer(r"('(?:[^']|'')*')|(\"(?:[^\"]|\"\")*\")|(;)", qry):
+        if match.group(3):
+            statements.append(qry[start:match.start()].strip())
+            start = match.end()
+    statements.append(qry[start:].strip())
+    return [statement for statement in statements if statement]
+
+
+def main_statement(statement):
+    """
+    Return a normalized statement without its leading WITH clause, e.g. the INSERT of 'WITH new AS (...) INSERT ...'.
+    """
+    match = re.match(r"WITH\s+(?:RECURSIVE\s+)?", statement, re.IGNORECASE)
+    if match is None:
+        return statement
+
+    # Skip the common table expressions: each one ends where its parentheses close and no ',' or AS follows
+    depth, position = 0, match.end()
+    for match in re.finditer(r"('(?:[^']|'')*')|(\"(?:[^\"]|\"\")*\")|([()])", statement[position:]):
+        if match.group(3) == "(":
+            depth += 1
+        elif match.group(3) == ")":
+            depth -= 1
+            rest = statement[position + match.end():].lstrip()
+            if depth == 0 and not re.match(r"(?:,|AS\b)", rest, re.IGNORECASE):
+                return rest
+    return statement
+
+
+def written_tables(statements):
+    """
+    Return the tables written by the statements, or None when a statement may change the database (or the session)
+    in a way that is not limited to known tables, e.g. SET, PRAGMA, ATTACH or a write whose target is unknown.
+    """
+    tables = set()
+    for statement in statements:
+        statement = main_statement(statement)
+        if not statement:
+            continue
+        keyword = re.match(r"[(\s]*([A-Za-z]*)", statement).group(1).upper()
+        if keyword in READ_ONLY_KEYWORDS:
+            continue
+        match = _WRITTEN_TABLE.match(statement) if keyword in MUTATING_KEYWORDS else None
+        if match is None:
+            return None
+        tables.add(match.group(1).lower())
+    return tables
+
+
+def is_deterministic(qry):
+    """
+    Return whether a normalized query gives the same result each time it runs on the same data.
+    """
+    tokens = {token.lower() for token in _IDENTIFIER.findall(_LEXER.sub(" ", qry))}
+    return not tokens & NONDETERMINISTIC_NAMES
+
+
+def is_mutating(qry):
+    """
+    Return whether a query writes to the database (or may, because a mutating statement's target is unknown).
+    """
+    written = written_tables(split_statements(normalize_sql(qry)))
+    return written is None or bool(written)
+
+
+def database_version(database_path):
+    """
+    Stamp identifying the current state of a database file and its WAL: (inode, size, mtime) of each.
+    """
+    stamp = []
+    for path in (database_path, database_path + ".wal"):
+        try:
+            stat = os.stat(path)
+            stamp.append((stat.st_ino, stat.st_size, stat.st_mtime_ns))
+        except FileNotFoundError:
+            stamp.append(None)
+    return tuple(stamp)
+
+
+def result_nbytes(result):
+    """
+    Approximate memory held by a pandas or Arrow result.
+    """
+    if hasattr(result, "nbytes"):
+        return result.nbytes
+    return int(result.memory_usage(deep=True).sum())
+
+
+class ResultCache:
+    """
+    Byte-bounded LRU cache of query results for one database.
+
+    Args:
+        database_path (str): Database the cached queries run on, used for the version stamp
+        max_bytes (int): Total size of the cached results before the least recently used are evicted
+    """
+
+    def __init__(self, database_path, max_bytes=DEFAULT_MAX_BYTES):
+        self.database_path = database_path
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries = OrderedDict()
+        self._dependencies = None
+        # Invalidation counters, '_generations' per table and '_epoch' for clearing everything: read when a query
+        # misses and checked again before its result is stored
+        self._generations = {}
+        self._epoch = 0
+        self._version = database_version(database_path)
+        self._lock = threading.Lock()
+
+    def _check_version(self):
+        # Called with the lock held: a change not made through the cache invalidates everything
+        version = database_version(self.database_path)
+        if version != self._version:
+            self._clear()
+            self._version = version
+
+    def _clear(self):
+        self._entries.clear()
+        self._dependencies = None
+        self.nbytes = 0
+        self._epoch += 1
+
+    def _table_dependencies(self, cursor):
+        # Catalog name -> tables it reads, with views expanded (cached until the next invalidation)
+        if self._dependencies is None:
+            rows = cursor.execute(
+                "SELECT table_name, NULL FROM duckdb_tables() UNION ALL SELECT view_name, sql FROM duckdb_views() "
+                "WHERE NOT internal"
+            ).fetchall()
+            views = {name.lower(): sql for name, sql in rows if sql is not None}
+            names = {name.lower() for name, _ in rows}
+
+            def expand(name, seen):
+                if name not in views or name in seen:
+                    return {name}
+                seen = seen | {name}
+                referenced = {token.lower() for token in _IDENTIFIER.findall(normalize_sql(views[name]))}
+                return {name}.union(*(expand(other, seen) for other in referenced & names if other != name))
+
+            self._dependencies = {name: expand(name, frozenset()) for name in names}
+        return self._dependencies
+
+    def read_tables(self, cursor, qry):
+        """
+        Return the tables (and views) a normalized query reads.
+        """
+        dependencies = self._table_dependencies(cursor)
+        tokens = {token.lower() for token in _IDENTIFIER.findall(_LEXER.sub(" ", qry))}
+        return set().union(*(dependencies[token] for token in tokens if token in dependencies))
+
+    def invalidate(self, tables=None):
+        """
+        Drop the entries that read any of 'tables' (all entries when 'tables' is None).
+        """
+        with self._lock:
+            self._invalidate(tables)
+
+    def _invalidate(self, tables):
+        if tables is None:
+            self._clear()
+            return
+        for table in tables:
+            self._generations[table] = self._generations.get(table, 0) + 1
+        for key in [key for key, (_, read, _) in self._entries.items() if read & tables]:
+            _, _, nbytes = self._entries.pop(key)
+            self.nbytes -= nbytes
+        # The catalog may have changed (e.g. a new table), so view dependencies are rebuilt
+        self._dependencies = None
+
+    def _is_current(self, epoch, generations, read):
+        # Whether no invalidation touched the tables a result read since its query missed
+        return epoch == self._epoch and all(
+            self._generations.get(table, 0) == generations.get(table, 0) for table in read
+        )
+
+    def _store(self, key, result, read):
+        nbytes = result_nbytes(result)
+        if nbytes > self.max_bytes:
+            return
+        self._entries[key] = (result, read, nbytes)
+        self.nbytes += nbytes
+        while self.nbytes > self.max_bytes:
+            _, (_, _, evicted) = self._entries.popitem(last=False)
+            self.nbytes -= evicted
+            self.evictions += 1
+
+    def execute(self, cursor, qry, parameters=None, result_format="pandas"):
+        """
+        Return a query's result from the cache, or execute it on 'cursor' and cache it.
+
+        Args:
+            cursor (DuckDBPyConnection): Connection or cursor on the cache's database
+            qry (str): SQL text
+            parameters (list): Optional prepared statement parameters
+            result_format (str): 'pandas' for a DataFrame or 'arrow' for an Arrow table
+
+        Returns:
+            DataFrame | Table: The result. DataFrames are copies, so callers may modify them.
+
+        """
+        normalized = normalize_sql(qry)
+        statements = split_statements(normalized)
+        written = written_tables(statements)
+        key = (normalized, repr(parameters), result_format)
+
+        with self._lock:
+            self._check_version()
+            mutating = written is None or bool(written)
+            cacheable = not mutating and is_deterministic(normalized)
+            if cacheable and key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                result = self._entries[key][0]
+                return result if result_format == "arrow" else result.copy()
+            self.misses += 1
+            # A write that commits while the query runs may not be in its result, so the result is only stored if no
+            # table it read was invalidated in the meantime
+            epoch, generations = self._epoch, dict(self._generations)
+
+        result = cursor.execute(qry, parameters or [])
+        result = result.fetch_arrow_table() if result_format == "arrow" else result.df()
+
+        with self._lock:
+            if mutating:
+                # Entries reading the written tables are stale; the rest stay valid under the new file version
+                self._invalidate(written)
+                self._version = database_version(self.database_path)
+            elif cacheable:
+                self._check_version()
+                read = self.read_tables(cursor, normalized)
+                if self._is_current(epoch, generations, read):
+                    self._store(key, result, read)
+        return result if result_format == "arrow" or mutating else result.copy()
@@ -3,6 +3,16 @@ import os
 import numpy as np
 import pandas as pd
 
+# The typed readers and the balance cache are optional helpers from this folder. Without them the inputs are read with
+# 'pd.read_csv()' and df_balances is built with 'calculate_df_balances()', so this file also runs on its own
+try:
+    import balance_cache
+    import ledger
+except ModuleNotFoundError as error:
+    if error.name not in ("amortization", "balance_cache", "ledger"):
+        raise
+    balance_cache = ledger = None
+
 """
 To answer the following questions, make use of datasets: 
     'scheduled_loan_repayments.csv'
@@ -78,17 +88,133 @@ def calculate_df_balances(df_scheduled, df_actual):
     return df_balances
 
 
-# Do not edit these directories
-root = os.getcwd()
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+SCHEDULED_PATH = os.path.join(DATA_DIR, "scheduled_loan_repayments.csv")
+ACTUAL_PATH = os.path.join(DATA_DIR, "actual_loan_repayments.csv")
+
+# The input frames and df_balances are loaded lazily on first access (e.g. 'Python.df_balances'), so importing this
+# module does no work. df_balances is served from an on-disk cache keyed by the contents of both CSVs.
+_lazy_frames = {}
+
+
+def get_df_scheduled():
+    """Return the 'scheduled_loan_repayments.csv' dataframe, reading it on first use."""
+    if "df_scheduled" not in _lazy_frames:
+        read = ledger.read_scheduled if ledger else pd.read_csv
+        _lazy_frames["df_scheduled"] = read(SCHEDULED_PATH)
+    return _lazy_frames["df_scheduled"]
+
+
+def get_df_actual():
+    """Return the 'actual_loan_repayments.csv' dataframe, reading it on first use."""
+    if "df_actual" not in _lazy_frames:
+        read = ledger.read_actual if ledger else pd.read_csv
+        _lazy_frames["df_actual"] = read(ACTUAL_PATH)
+    return _lazy_frames["df_actual"]
+
+
+def get_df_balances():
+    """Return df_balances, loading it from the balance cache (or building the cache) on first use."""
+    if "df_balances" not in _lazy_frames:
+        if balance_cache:
+            _lazy_frames["df_balances"] = balance_cache.load_balances(SCHEDULED_PATH, ACTUAL_PATH)
+        else:
+            _lazy_frames["df_balances"] = calculate_df_balances(get_df_scheduled(), get_df_actual())
+    return _lazy_frames["df_balances"]
+
+
+_lazy_accessors = {
+    "df_scheduled": get_df_scheduled,
+    "df_actual": get_df_actual,
+    "df_balances": get_df_balances,
+}
+
+
+def __getattr__(name):
+    # Module level attribute hook (PEP 562) - keeps 'Python.df_balances' etc. working without eager loading
+    if name in _lazy_accessors:
+        return _lazy_accessors[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# The formulas below are shared with the chunked/sharded engines ('aggregates.py'), which apply them to per-loan
+# totals accumulated batch by batch instead of to a whole df_balances frame
+
+
+def loan_totals(df_balances):
+    """
+    Per-loan totals behind 'question_1()', 'question_2()' and 'question_4()', from one grouped pass over df_balances.
+
+    Args:
+        df_balances (DataFrame): Dataframe created from the 'calculate_df_balances()' function
+
+    Returns:
+        DataFrame: Indexed by LoanID, with the ScheduledRepayment, whether any repayment was Missed, the ActualTotal
+        and ActualYear1 repayments, and whether the loan has any year 1 rows (Year1Seen).
+
+    """
+    actual = df_balances["ActualRepayment"]
+    year1 = df_balances["Month"] <= 12
+
+    return pd.DataFrame(
+        {
+            "ScheduledRepayment": df_balances["ScheduledRepayment"],
+            "Missed": actual < df_balances["ScheduledRepayment"],
+            "ActualTotal": actual,
+            "Year1Seen": year1,
+            "ActualYear1": actual.where(year1, 0.0),
+        }
+    ).groupby(df_balances["LoanID"]).agg(
+        {"ScheduledRepayment": "first", "Missed": "any", "ActualTotal": "sum", "Year1Seen": "any", "ActualYear1": "sum"}
+    )
+
+
+def type2_defaults(scheduled_repayment, actual_paid):
+    """
+    Flag the loans with more than 15% of their expected yearly payments (ScheduledRepayment * 12) unpaid.
+    Missing (NaN) payments are never flagged.
+    """
+    scheduled_yearly = scheduled_repayment * 12
+    unpaid = scheduled_yearly - actual_paid
+    return unpaid > (0.15 * scheduled_yearly)
 
-if "Task_2" in root:
-    df_scheduled = pd.read_csv("data/scheduled_loan_repayments.csv")
-    df_actual = pd.read_csv("data/actual_loan_repayments.csv")
-else:
-    df_scheduled = pd.read_csv("Task_2/data/scheduled_loan_repayments.csv")
-    df_actual = pd.read_csv("Task_2/data/actual_loan_repayments.csv")
 
-df_balances = calculate_df_balances(df_scheduled, df_actual)
+def monthly_smm(start, end, scheduled, interest):
+    """
+    SMM = Unscheduled Principal / Start of Month Loan Balance for every loan-month with a balance.
+
+    Args:
+        start, end (array-like): LoanBalanceStart and LoanBalanceEnd
+        scheduled, interest (array-like): ScheduledRepayment and InterestPayment
+
+    Returns:
+        array-like: The SMM of each loan-month with LoanBalanceStart > 0 (NaNs dropped).
+
+    """
+    # Unscheduled principal is the principal paid above the scheduled principal
+    unscheduled = np.clip((start - end) - (scheduled - interest), 0, None)
+    active = start > 0
+    smm = unscheduled[active] / start[active]
+    return smm[~np.isnan(smm)]
+
+
+def annualised_cpr(smm_log_sum):
+    """
+    Annualised CPR as a percent from the sum of log(1 + SMM) over the loan-months.
+
+    SMM_mean = (∏(1+SMM))^(1/12) - 1 is computed as EXP(sum / 12) - 1, so the product itself never overflows. The 12th
+    root of a product over every loan-month still grows with the book, and overflows (to -inf) on large books.
+    """
+    SMM_mean = np.exp(smm_log_sum / 12) - 1
+    CPR = 1 - (1 - SMM_mean) ** 12
+    return CPR * 100
+
+
+def expected_loss(probability_of_default, total_loan_balance, recovery_rate=0.80):
+    """
+    Expected loss = probability_of_default * total_loan_balance * (1 - recovery_rate).
+    """
+    return probability_of_default * total_loan_balance * (1 - recovery_rate)
 
 
 def question_1(df_balances):
@@ -102,16 +228,12 @@ def question_1(df_balances):
         float: The percentage of type 1 defaulted loans (ie 50.0 not 0.5)
 
     """
-    # 1. Flag each loan payments that were missed/underpaid i.e. TRUE if monthly payment is missed/underpaid
-    df_balances["missed"] = df_balances["ActualRepayment"] < df_balances["ScheduledRepayment"]
+    # 1. A loan is a type 1 default if any monthly repayment was missed/underpaid (ActualRepayment < ScheduledRepayment)
+    loan_default_flag = loan_totals(df_balances)["Missed"]
 
-    # 2. Group each loan by loan ID to check if any unpaid payments per loan exist
-    loan_default_flag = df_balances.groupby("LoanID")["missed"].any() # If True the loan defaulted if False the loan is clean
+    # 2. Convert the boolean flag into a percentage
+    return loan_default_flag.mean() * 100
 
-    # 3. Convert boolean flag into percentage
-    default_rate_percent = loan_default_flag.mean() * 100
-    
-    return default_rate_percent
 
 def question_2(df_scheduled, df_balances):
     """
@@ -125,23 +247,15 @@ def question_2(df_scheduled, df_balances):
         float: The percentage of type 2 defaulted loans (ie 50.0 not 0.5)
 
     """
-    # 1. Calcualtion of the Scheduled yearly payments (monthly payment * 12)
-    scheduled_yearly = df_scheduled.set_index("LoanID")["ScheduledRepayment"] * 12
-    
-    # 2. Calcualtion of the Actual yearly payments (monthly payment * 12)
-    actual_yearly = df_balances.groupby("LoanID")["ActualRepayment"].sum()
-    
-    # 3. Calculate the amount that was not paid for the year
-    unpaid_amount = scheduled_yearly - actual_yearly
-
-    # 4. Apply Type 2 Loan Default Rule - If more than 15% of expected yearly payments are unpaid it returns TRUE
-    # unpaid_amount > 15% * expected_yearly - Generate a TRUE/FALSE boolean
-    type2_default = unpaid_amount > (0.15 * scheduled_yearly)
+    # 1. Actual payments per scheduled loan - loans without any repayments count towards the total but are not flagged
+    scheduled_repayment = df_scheduled.set_index("LoanID")["ScheduledRepayment"]
+    actual_paid = loan_totals(df_balances)["ActualTotal"].reindex(scheduled_repayment.index)
 
-    # 5. Compute the percentage of defaulted loans (Convert the boolean to a percentage)
-    default_rate_percent = type2_default.mean() * 100
+    # 2. A loan is a type 2 default if more than 15% of its expected yearly payments are unpaid
+    type2_default = type2_defaults(scheduled_repayment, actual_paid)
 
-    return default_rate_percent
+    # 3. Convert the boolean flag into a percentage
+    return type2_default.mean() * 100
 
 
 def question_3(df_balances):
@@ -158,39 +272,20 @@ def question_3(df_balances):
         float: The anualized CPR of the loan portfolio as a percent.
 
     """
-    # Create alias for df_balances
-    df = df_balances.copy()
-
-    # 1. Calculate the total pricipal paid in each month
-    df["PrincipalPaid"] = df["LoanBalanceStart"] - df["LoanBalanceEnd"]
-
-    # 2. Calcualte the scheduled principal for each month
-    df["ScheduledPrincipal"] = df["ScheduledRepayment"] - df["InterestPayment"]
-
-    # 3. Calculate the unscheduled principal ( Excess principal paid above the scheduled principal)
-    df["UnscheduledPrincipal"] = (df["PrincipalPaid"] - df["ScheduledPrincipal"]).clip(lower=0)
-
-    # 4. Filter out months where the loan had no balance
-    df = df[df["LoanBalanceStart"] > 0]
-
-    # 5. Calcualte the monthly SMM for each loan 
-    df["SMM"] = df["UnscheduledPrincipal"] / df["LoanBalanceStart"] 
-
-    # 6. Calculate the SMM mean over all loan-months
-    SMM_series = df["SMM"].dropna() #dropna ensures that only valid SMM values are considered
-
-    if SMM_series.empty:
+    # 1. SMM per loan-month = max(PrincipalPaid - ScheduledPrincipal, 0) / LoanBalanceStart over months with a balance
+    smm = monthly_smm(
+        df_balances["LoanBalanceStart"].to_numpy(dtype=np.float64),
+        df_balances["LoanBalanceEnd"].to_numpy(dtype=np.float64),
+        df_balances["ScheduledRepayment"].to_numpy(dtype=np.float64),
+        df_balances["InterestPayment"].to_numpy(dtype=np.float64),
+    )
+    if len(smm) == 0:
         return 0.0
-        
-    SMM_mean = ((1 + SMM_series).prod() ** (1/12)) - 1 #Formual given as (Π(1 + SMM) )^(1/12) – 1
 
-    # 7. Calculate annualised CPR by using SMM_Mean
-    CPR = 1 - (1 - SMM_mean)**12
-    cpr_percent= CPR * 100
-    
-    return cpr_percent
-    
-print(question_3(df_balances))
+    # 2. The product of (1 + SMM) is accumulated as a sum of logs; 'prepayment.py' gives CPRs that do not depend on the
+    # book size
+    return annualised_cpr(np.log1p(smm).sum())
+
 
 def question_4(df_balances):
     """
@@ -207,30 +302,14 @@ def question_4(df_balances):
         float: The predicted total loss for the second year in the loan term.
 
     """
-    
-    # 1. Calculate the expected yearly payment (ScheduledRepayment * 12)
-    scheduled_yearly = (df_balances.groupby("LoanID")["ScheduledRepayment"].first() * 12)
-
-    #2. Calculate the actual payments for Year 1 per loan id (Months 1–12)
-    actual_yearly = (df_balances[df_balances["Month"] <= 12].groupby("LoanID")["ActualRepayment"].sum())
-
-    #3. Calcualte the unpaid loan amount for the year
-    unpaid = scheduled_yearly - actual_yearly
-
-    #4. Use type 2 default as the probability of default
-    type2_defaults = unpaid > (0.15 * scheduled_yearly) #Apply Type 2 default rate as per question 2
-    probability_of_default = type2_defaults.mean()  # not percent
-
-    #5 .Calculate the Total loan balance entering Year 2
-    year2_balances = df_balances[df_balances["Month"] == 13]["LoanBalanceStart"]
-    total_loan_balance = year2_balances.sum()
-
-    #6. Loss calculation
-    recovery_rate = 0.80
-    total_loss = probability_of_default * total_loan_balance * (1 - recovery_rate)
-
-    return total_loss
-
-
+    # 1. The type 2 definition is used for the probability of default: it measures the share of the year's payments
+    # that went unpaid, rather than flagging a loan for a single short payment. It is applied to year 1 (months 1-12)
+    totals = loan_totals(df_balances)
+    type2_default = totals["Year1Seen"] & type2_defaults(totals["ScheduledRepayment"], totals["ActualYear1"])
+    probability_of_default = type2_default.mean()  # not percent
 
+    # 2. Total loan balance entering year 2
+    total_loan_balance = df_balances.loc[df_balances["Month"] == 13, "LoanBalanceStart"].sum()
 
+    # 3. Loss calculation
+    return expected_loss(probability_of_default, total_loan_balance, recovery_rate=0.80)
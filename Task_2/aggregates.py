@@ -0,0 +1,203 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from Python import annualised_cpr, expected_loss, monthly_smm, type2_defaults
+
+"""
+Mergeable per-loan partial aggregates for the Task_2 questions.
+
+'question_1()' - 'question_4()' in Python.py each need a full 'df_balances' frame. Every figure they return is a
+function of a handful of per-loan totals (any missed payment, total and year 1 repayments) and a few portfolio sums
+(the sum of log(1 + SMM) and the month 13 balance). 'PortfolioAggregates' keeps exactly those, so balances can be fed in
+chunk by chunk (or shard by shard) and thrown away, and the answers read off at the end with the same formulas the
+questions use.
+
+"""
+
+
+@dataclass
+class PortfolioAggregates:
+    """
+    Partial aggregates over any subset of 'df_balances' rows.
+
+    Per-loan arrays are aligned with 'loan_ids', which is the sorted set of LoanIDs in the scheduled data.
+    Two aggregates over disjoint rows of the same book combine with 'merge()'.
+    """
+
+    loan_ids: np.ndarray
+    scheduled_repayment: np.ndarray
+    seen: np.ndarray
+    missed: np.ndarray
+    actual_total: np.ndarray
+    year1_seen: np.ndarray
+    actual_year1: np.ndarray
+    smm_log_sum: float = 0.0
+    smm_count: int = 0
+    year2_balance: float = 0.0
+
+    @classmethod
+    def empty(cls, df_scheduled):
+        """
+        Create empty aggregates for every loan in the scheduled data.
+
+        Args:
+            df_scheduled (DataFrame): Dataframe created from the 'scheduled_loan_repayments.csv' dataset
+
+        Returns:
+            PortfolioAggregates: Aggregates with no rows folded in.
+
+        """
+        scheduled = df_scheduled.sort_values("LoanID", kind="stable")
+        n_loans = len(scheduled)
+
+        return cls(
+            loan_ids=scheduled["LoanID"].to_numpy(),
+            scheduled_repayment=scheduled["ScheduledRepayment"].to_numpy(dtype=np.float64),
+            seen=np.zeros(n_loans, dtype=bool),
+            missed=np.zeros(n_loans, dtype=bool),
+            actual_total=np.zeros(n_loans),
+            year1_seen=np.zeros(n_loans, dtype=bool),
+            actual_year1=np.zeros(n_loans),
+        )
+
+    def update(self, df_balances):
+        """
+        Fold a batch of balance rows (any subset of 'df_balances', in any order) into the aggregates.
+
+        Raises:
+            ValueError: A row's LoanID is not in the scheduled data the aggregates were created from.
+
+        """
+        n_loans = len(self.loan_ids)
+        loan_ids = df_balances["LoanID"].to_numpy()
+        pos = np.minimum(np.searchsorted(self.loan_ids, loan_ids), max(n_loans - 1, 0))
+        unknown = self.loan_ids[pos] != loan_ids if n_loans else np.ones(len(loan_ids), dtype=bool)
+        if unknown.any():
+            raise ValueError(
+                f"{np.unique(loan_ids[unknown]).size} LoanIDs in the balance rows are not in the scheduled data, "
+                f"e.g. {loan_ids[unknown][0]}"
+            )
+
+        month = df_balances["Month"].to_numpy()
+        actual = df_balances["ActualRepayment"].to_numpy(dtype=np.float64)
+        scheduled = df_balances["ScheduledRepayment"].to_numpy(dtype=np.float64)
+        start = df_balances["LoanBalanceStart"].to_numpy(dtype=np.float64)
+        end = df_balances["LoanBalanceEnd"].to_numpy(dtype=np.float64)
+        interest = df_balances["InterestPayment"].to_numpy(dtype=np.float64)
+
+        # 1. Default inputs (question_1, question_2 and question_4)
+        self.seen |= np.bincount(pos, minlength=n_loans) > 0
+        self.missed |= np.bincount(pos, weights=actual < scheduled, minlength=n_loans) > 0
+        self.actual_total += np.bincount(pos, weights=actual, minlength=n_loans)
+
+        year1 = month <= 12
+        self.year1_seen |= np.bincount(pos[year1], minlength=n_loans) > 0
+        self.actual_year1 += np.bincount(pos[year1], weights=actual[year1], minlength=n_loans)
+
+        # 2. SMM inputs (question_3), kept as a sum of logs so chunks and shards merge by addition
+        smm = monthly_smm(start, end, scheduled, interest)
+        self.smm_log_sum += float(np.log1p(smm).sum())
+        self.smm_count += len(smm)
+
+        # 3. Exposure entering year 2 (question_4)
+        self.year2_balance += float(start[month == 13].sum())
+
+        return self
+
+    def merge(self, other):
+        """
+        Combine with aggregates built over a disjoint set of rows from the same scheduled data.
+        """
+        return PortfolioAggregates(
+            loan_ids=self.loan_ids,
+            scheduled_repayment=self.scheduled_repayment,
+            seen=self.seen | other.seen,
+            missed=self.missed | other.missed,
+            actual_total=self.actual_total + other.actual_total,
+            year1_seen=self.year1_seen | other.year1_seen,
+            actual_year1=self.actual_year1 + other.actual_year1,
+            smm_log_sum=self.smm_log_sum + other.smm_log_sum,
+            smm_count=self.smm_count + other.smm_count,
+            year2_balance=self.year2_balance + other.year2_balance,
+        )
+
+    @classmethod
+    def combine_shards(cls, shards):
+        """
+        Combine aggregates built over disjoint sets of loans (e.g. one per worker).
+
+        The reduction is deterministic: per-loan arrays are re-sorted by LoanID and the portfolio sums are added in the
+        order the shards are given, so the result does not depend on which worker finished first.
+        """
+        def concat(field):
+            return np.concatenate([getattr(shard, field) for shard in shards])
+
+        loan_ids = concat("loan_ids")
+        order = np.argsort(loan_ids, kind="stable")
+
+        return cls(
+            loan_ids=loan_ids[order],
+            scheduled_repayment=concat("scheduled_repayment")[order],
+            seen=concat("seen")[order],
+            missed=concat("missed")[order],
+            actual_total=concat("actual_total")[order],
+            year1_seen=concat("year1_seen")[order],
+            actual_year1=concat("actual_year1")[order],
+            smm_log_sum=sum(shard.smm_log_sum for shard in shards),
+            smm_count=sum(shard.smm_count for shard in shards),
+            year2_balance=sum(shard.year2_balance for shard in shards),
+        )
+
+    def question_1(self):
+        """
+        Percentage of type 1 defaulted loans, as returned by 'question_1()'.
+        """
+        return self.missed[self.seen].mean() * 100
+
+    def question_2(self):
+        """
+        Percentage of type 2 defaulted loans, as returned by 'question_2()'.
+        Loans without any repayment rows count towards the total but never default.
+        """
+        type2_default = self.seen & type2_defaults(self.scheduled_repayment, self.actual_total)
+        return type2_default.mean() * 100
+
+    def question_3(self):
+        """
+        Annualised portfolio CPR as a percent, as returned by 'question_3()' (see 'annualised_cpr()').
+        """
+        if self.smm_count == 0:
+            return 0.0
+
+        return annualised_cpr(self.smm_log_sum)
+
+    def year1_default_probability(self):
+        """
+        Share of loans with repayments that are type 2 defaults on their year 1 repayments, the PD of 'question_4()'.
+        """
+        type2_default = type2_defaults(self.scheduled_repayment[self.seen], self.actual_year1[self.seen])
+        return (self.year1_seen[self.seen] & type2_default).mean()
+
+    def question_4(self, recovery_rate=0.80):
+        """
+        Predicted total loss for the second year of the loan term, as returned by 'question_4()'.
+        """
+        return expected_loss(self.year1_default_probability(), self.year2_balance, recovery_rate)
+
+    def to_frame(self):
+        """
+        Return the per-loan aggregates as a DataFrame indexed by LoanID.
+        """
+        return pd.DataFrame(
+            {
+                "ScheduledRepayment": self.scheduled_repayment,
+                "Seen": self.seen,
+                "Missed": self.missed,
+                "ActualTotal": self.actual_total,
+                "Year1Seen": self.year1_seen,
+                "ActualYear1": self.actual_year1,
+            },
+            index=pd.Index(self.loan_ids, name="LoanID"),
+        )
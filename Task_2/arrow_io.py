@@ -0,0 +1,112 @@
+import os
+
+import duckdb
+import pyarrow as pa
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+
+from ledger import ACTUAL_SCHEMA, SCHEDULED_SCHEMA
+
+"""
+Arrow data path for the Task_2 inputs.
+
+Scheduled and actual repayments can be read from a DuckDB database (the `scheduled` and `actual` tables built by
+'sql_engine.build_database()', or any query via 'query_arrow()'), from Parquet or from the CSV files. Every source
+produces an Arrow table in the ledger schema ('ledger.py'), which is handed to pandas with 'split_blocks' and
+'self_destruct': each fixed-width, null-free column becomes its own NumPy-backed block that reuses the Arrow buffer
+instead of being copied into a consolidated 2D block, and Arrow buffers are released as soon as they are converted.
+The frames are plain NumPy-backed frames, so 'calculate_df_balances()', the vectorized engines and the question
+functions use them unchanged.
+
+This module is a standalone alternative to the pandas readers in 'ledger.py': Python.py and the balance cache read the
+CSVs with 'ledger.py', and callers that hold their inputs as Parquet or in DuckDB use the readers below directly.
+
+"""
+
+SCHEDULED_ARROW_SCHEMA = pa.schema([(name, pa.from_numpy_dtype(dtype)) for name, dtype in SCHEDULED_SCHEMA.items()])
+ACTUAL_ARROW_SCHEMA = pa.schema([(name, pa.from_numpy_dtype(dtype)) for name, dtype in ACTUAL_SCHEMA.items()])
+
+DATABASE_EXTENSIONS = (".db", ".duckdb")
+
+
+def to_arrow_schema(table, schema):
+    """
+    Select and cast an Arrow table's columns to 'schema'; Arrow's safe cast refuses lossy conversions.
+    """
+    return table.select(schema.names).cast(schema, safe=True)
+
+
+def to_frame(table):
+    """
+    Convert an Arrow table to a NumPy-backed DataFrame without duplicating its buffers.
+
+    The table must not be used afterwards: its buffers are released ('self_destruct') as columns are converted.
+    """
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def query_arrow(database_path, qry, parameters=None):
+    """
+    Run a query on a DuckDB database (opened read only) and fetch its result as an Arrow table.
+    """
+    with duckdb.connect(database_path, read_only=True) as cursor:
+        return cursor.execute(qry, parameters or []).fetch_arrow_table()
+
+
+def read_arrow(path, table_name, schema):
+    """
+    Read one input as an Arrow table in the ledger schema.
+
+    Args:
+        path (str): A DuckDB database (.db/.duckdb), a Parquet file (.parquet) or a CSV file
+        table_name (str): Table to read when 'path' is a database, e.g. 'scheduled'
+        schema (Schema): Arrow schema of the result, e.g. 'SCHEDULED_ARROW_SCHEMA'
+
+    Returns:
+        Table: The input's rows with exactly the schema's columns and types.
+
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in DATABASE_EXTENSIONS:
+        columns = ", ".join(schema.names)
+        table = query_arrow(path, f"SELECT {columns} FROM {table_name}")
+    elif extension == ".parquet":
+        table = pq.read_table(path, columns=schema.names)
+    else:
+        table = pv.read_csv(path, convert_options=pv.ConvertOptions(include_columns=schema.names))
+
+    return to_arrow_schema(table, schema)
+
+
+def read_scheduled(path):
+    """
+    Read scheduled repayments from a DuckDB database, Parquet or CSV into a ledger-typed DataFrame.
+    """
+    return to_frame(read_arrow(path, "scheduled", SCHEDULED_ARROW_SCHEMA))
+
+
+def read_actual(path):
+    """
+    Read actual repayments from a DuckDB database, Parquet or CSV into a ledger-typed DataFrame.
+    """
+    return to_frame(read_arrow(path, "actual", ACTUAL_ARROW_SCHEMA))
+
+
+def write_parquet(scheduled_path, actual_path, out_dir):
+    """
+    Convert the two inputs (from any source 'read_arrow()' accepts) to ledger-typed Parquet files.
+
+    Returns:
+        tuple[str, str]: Paths of the scheduled and actual Parquet files.
+
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for path, table_name, schema in (
+        (scheduled_path, "scheduled", SCHEDULED_ARROW_SCHEMA),
+        (actual_path, "actual", ACTUAL_ARROW_SCHEMA),
+    ):
+        parquet_path = os.path.join(out_dir, f"{table_name}.parquet")
+        pq.write_table(read_arrow(path, table_name, schema), parquet_path)
+        paths.append(parquet_path)
+    return tuple(paths)
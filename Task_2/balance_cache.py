@@ -0,0 +1,104 @@
+import hashlib
+import os
+
+import pandas as pd
+
+from amortization import ENGINE_VERSION, calculate_balances
+from ledger import LEDGER_VERSION, read_actual, read_scheduled
+
+"""
+Persistent cache for the Task_2 balance frame.
+
+'df_balances' is written to a Parquet file whose name is a content hash of the two input CSVs, the balance engine
+version and the ledger schema version. A warm load is a single Parquet read; the cache rebuilds only when an input
+file or a version changes. Stale cache files are left in place and can be removed with 'clear_cache()'.
+
+"""
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+CACHE_DIR = os.path.join(DATA_DIR, ".cache")
+
+SCHEDULED_PATH = os.path.join(DATA_DIR, "scheduled_loan_repayments.csv")
+ACTUAL_PATH = os.path.join(DATA_DIR, "actual_loan_repayments.csv")
+
+
+def file_digest(path, block_size=1 << 20):
+    """
+    Return the sha256 hex digest of a file's contents, read in blocks so large inputs are never fully in memory.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(scheduled_path=SCHEDULED_PATH, actual_path=ACTUAL_PATH):
+    """
+    Build the cache key for a pair of input files.
+
+    Args:
+        scheduled_path (str): Path to 'scheduled_loan_repayments.csv'
+        actual_path (str): Path to 'actual_loan_repayments.csv'
+
+    Returns:
+        str: A hex key that changes whenever either input, the engine version or the ledger schema changes.
+
+    """
+    digest = hashlib.sha256()
+    digest.update(f"engine={ENGINE_VERSION};ledger={LEDGER_VERSION}".encode())
+    for path in (scheduled_path, actual_path):
+        digest.update(file_digest(path).encode())
+    return digest.hexdigest()[:32]
+
+
+def load_balances(scheduled_path=SCHEDULED_PATH, actual_path=ACTUAL_PATH, cache_dir=CACHE_DIR):
+    """
+    Load 'df_balances' from the cache, computing and persisting it on a miss.
+
+    Args:
+        scheduled_path (str): Path to 'scheduled_loan_repayments.csv'
+        actual_path (str): Path to 'actual_loan_repayments.csv'
+        cache_dir (str): Directory holding the cached Parquet files
+
+    Returns:
+        DataFrame: The same frame 'calculate_balances()' returns for the two inputs.
+
+    """
+    cache_path = os.path.join(cache_dir, f"balances-{cache_key(scheduled_path, actual_path)}.parquet")
+
+    # 1. Warm path - a single columnar read
+    if os.path.exists(cache_path):
+        return pd.read_parquet(cache_path)
+
+    # 2. Cold path - compute from the CSVs
+    df_balances = calculate_balances(read_scheduled(scheduled_path), read_actual(actual_path))
+
+    # 3. Write to a temporary file and rename, so concurrent readers never see a partial cache file. A failed write
+    # removes its temporary file; one left by a killed process is never read, and 'clear_cache()' removes it
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        df_balances.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, cache_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return df_balances
+
+
+def clear_cache(cache_dir=CACHE_DIR):
+    """
+    Remove every cached balance file. Returns the number of files removed.
+    """
+    if not os.path.isdir(cache_dir):
+        return 0
+
+    removed = 0
+    for name in os.listdir(cache_dir):
+        if name.startswith("balances-"):
+            os.remove(os.path.join(cache_dir, name))
+            removed += 1
+    return removed
@@ -0,0 +1,171 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from aggregates import PortfolioAggregates
+from amortization import amortize_frame
+
+"""
+Incremental month-end processing for the Task_2 loan book.
+
+'BalanceState' holds the running state of every loan: its unrounded closing balance, the last month processed and
+the 'PortfolioAggregates' behind 'question_1()' - 'question_4()'. Appending a new month of actual repayments only
+touches the rows in that batch, so month-end cost depends on the size of the new month rather than the whole history.
+
+"""
+
+
+@dataclass
+class BalanceState:
+    """
+    Running per-loan state, aligned with 'aggregates.loan_ids'.
+
+    'closing_balance' is NaN and 'last_month' is 0 for loans that have no repayments yet.
+    """
+
+    aggregates: PortfolioAggregates
+    closing_balance: np.ndarray
+    last_month: np.ndarray
+
+    @classmethod
+    def empty(cls, df_scheduled):
+        """
+        Create the state of a book with no repayments processed.
+
+        Args:
+            df_scheduled (DataFrame): Dataframe created from the 'scheduled_loan_repayments.csv' dataset
+
+        Returns:
+            BalanceState: State where every loan starts from its LoanAmount.
+
+        """
+        aggregates = PortfolioAggregates.empty(df_scheduled)
+        n_loans = len(aggregates.loan_ids)
+        return cls(
+            aggregates=aggregates,
+            closing_balance=np.full(n_loans, np.nan),
+            last_month=np.zeros(n_loans, dtype=np.int64),
+        )
+
+    @classmethod
+    def from_balances(cls, df_scheduled, df_balances):
+        """
+        Rebuild the state from an existing 'df_balances' frame.
+
+        The persisted 'LoanBalanceEnd' column is rounded to 2 dp, so balances appended afterwards can differ from a
+        full recomputation by rounding noise. Use 'save()'/'load()' to carry the exact state between runs.
+
+        Args:
+            df_scheduled (DataFrame): Dataframe created from the 'scheduled_loan_repayments.csv' dataset
+            df_balances (DataFrame): Dataframe created from the 'calculate_df_balances()' function
+
+        Returns:
+            BalanceState: State continuing from the last month of each loan in 'df_balances'.
+
+        """
+        state = cls.empty(df_scheduled)
+        state.aggregates.update(df_balances)
+
+        last_rows = df_balances.sort_values(["LoanID", "Month"], kind="stable").groupby("LoanID").tail(1)
+        pos = np.searchsorted(state.aggregates.loan_ids, last_rows["LoanID"].to_numpy())
+        state.closing_balance[pos] = last_rows["LoanBalanceEnd"].to_numpy(dtype=np.float64)
+        state.last_month[pos] = last_rows["Month"].to_numpy()
+        return state
+
+    def append(self, df_scheduled, df_new):
+        """
+        Append a batch of actual repayments (e.g. month N+1) to the book.
+
+        Args:
+            df_scheduled (DataFrame): Dataframe created from the 'scheduled_loan_repayments.csv' dataset
+            df_new (DataFrame): New rows in the 'actual_loan_repayments.csv' format
+
+        Returns:
+            DataFrame: The new 'df_balances' rows, ordered by LoanID and Month.
+
+        Raises:
+            ValueError: A loan is not in the book, or its month was already processed or appears more than once in the
+                batch.
+
+        """
+        df_merged = pd.merge(df_new, df_scheduled)
+        df_merged = df_merged.sort_values(["LoanID", "Month"], kind="stable").reset_index(drop=True)
+        if df_merged.empty:
+            return df_merged
+
+        # 1. Every loan in the batch must be in the book and continue after the last month already processed for it
+        loan_ids = df_merged["LoanID"].to_numpy()
+        n_loans = len(self.aggregates.loan_ids)
+        pos = np.minimum(np.searchsorted(self.aggregates.loan_ids, loan_ids), max(n_loans - 1, 0))
+        unknown = self.aggregates.loan_ids[pos] != loan_ids if n_loans else np.ones(len(loan_ids), dtype=bool)
+        if unknown.any():
+            raise ValueError(f"LoanID {loan_ids[unknown][0]} is not in the book this state was created from")
+
+        month = df_merged["Month"].to_numpy()
+        stale = month <= self.last_month[pos]
+        if stale.any():
+            raise ValueError(
+                f"LoanID {loan_ids[stale][0]} repeats or goes back to month {month[stale][0]}, which was already "
+                "processed; repayments must be appended in Month order within each LoanID"
+            )
+
+        # The batch is sorted, so a (LoanID, Month) given twice in it is on neighbouring rows
+        repeated = (loan_ids[1:] == loan_ids[:-1]) & (month[1:] == month[:-1])
+        if repeated.any():
+            raise ValueError(
+                f"LoanID {loan_ids[1:][repeated][0]} has more than one row for month {month[1:][repeated][0]} in the "
+                "batch"
+            )
+
+        # 2. Continue each loan from its carried balance
+        batch_pos = np.unique(pos)
+        opening = pd.Series(self.closing_balance[batch_pos], index=self.aggregates.loan_ids[batch_pos])
+        df_balances, closing = amortize_frame(df_merged, opening)
+
+        # 3. Roll the running state forward
+        self.closing_balance[batch_pos] = closing.to_numpy()
+        np.maximum.at(self.last_month, pos, month)
+        self.aggregates.update(df_balances)
+
+        return df_balances
+
+    def save(self, path):
+        """
+        Persist the exact (unrounded) state to a '.npz' file.
+        """
+        agg = self.aggregates
+        np.savez(
+            path,
+            closing_balance=self.closing_balance,
+            last_month=self.last_month,
+            loan_ids=agg.loan_ids,
+            scheduled_repayment=agg.scheduled_repayment,
+            seen=agg.seen,
+            missed=agg.missed,
+            actual_total=agg.actual_total,
+            year1_seen=agg.year1_seen,
+            actual_year1=agg.actual_year1,
+            totals=np.array([agg.smm_log_sum, agg.smm_count, agg.year2_balance]),
+        )
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a state written by 'save()'.
+        """
+        with np.load(path) as data:
+            smm_log_sum, smm_count, year2_balance = data["totals"]
+            aggregates = PortfolioAggregates(
+                loan_ids=data["loan_ids"],
+                scheduled_repayment=data["scheduled_repayment"],
+                seen=data["seen"],
+                missed=data["missed"],
+                actual_total=data["actual_total"],
+                year1_seen=data["year1_seen"],
+                actual_year1=data["actual_year1"],
+                smm_log_sum=float(smm_log_sum),
+                smm_count=int(smm_count),
+                year2_balance=float(year2_balance),
+            )
+            return cls(aggregates=aggregates, closing_balance=data["closing_balance"], last_month=data["last_month"])
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+
+"""
+Compact, typed representation of the Task_2 loan ledger.
+
+'pd.read_csv' infers 'RepaymentID' as float64 (the file stores '1.0') and every key as int64, so each loan-month costs
+32 bytes before any balances are added. The schemas below pin every column to the smallest type that holds it:
+int32 loan ids, a uint8 month (a 2 year term is 24 months) and float64 for money, which must stay float64 for the
+balance engine to reproduce 'calculate_df_balances()' exactly.
+
+'RepaymentID' also stays float64: the source file contains a non-integer id (4614.49), and 'to_ledger()' refuses
+casts that would silently change a value.
+
+"""
+
+# Bump whenever a schema changes so that results persisted with the old types are invalidated
+LEDGER_VERSION = "1"
+
+SCHEDULED_SCHEMA = {
+    "LoanID": np.int32,
+    "LoanAmount": np.float64,
+    "ScheduledRepayment": np.float64,
+}
+
+ACTUAL_SCHEMA = {
+    "RepaymentID": np.float64,
+    "LoanID": np.int32,
+    "Month": np.uint8,
+    "ActualRepayment": np.float64,
+}
+
+
+def to_ledger(df, schema):
+    """
+    Cast a frame to a ledger schema, refusing any lossy conversion.
+
+    Args:
+        df (DataFrame): Frame holding (at least) the schema's columns
+        schema (dict): Column name to NumPy dtype, e.g. 'ACTUAL_SCHEMA'
+
+    Returns:
+        DataFrame: A new frame with only the schema's columns, in schema order, each stored as one typed array.
+
+    """
+    columns = {}
+    for name, dtype in schema.items():
+        values = df[name].to_numpy()
+
+        if np.issubdtype(dtype, np.integer):
+            # 1. Integer columns - values must be whole numbers inside the target range
+            info = np.iinfo(dtype)
+            if len(values) and (values.min() < info.min or values.max() > info.max):
+                raise ValueError(f"Column '{name}' has values outside the {np.dtype(dtype).name} range")
+            if np.issubdtype(values.dtype, np.floating) and not np.array_equal(values, np.trunc(values)):
+                raise ValueError(
+                    f"Column '{name}' has non-integer values and cannot be stored as {np.dtype(dtype).name}"
+                )
+
+        columns[name] = values.astype(dtype, copy=False)
+
+    return pd.DataFrame(columns, index=df.index)
+
+
+def read_scheduled(path):
+    """
+    Read 'scheduled_loan_repayments.csv' into the compact ledger schema.
+    """
+    return to_ledger(pd.read_csv(path), SCHEDULED_SCHEMA)
+
+
+def read_actual(path):
+    """
+    Read 'actual_loan_repayments.csv' into the compact ledger schema.
+    """
+    return to_ledger(pd.read_csv(path, dtype={"ActualRepayment": np.float64}), ACTUAL_SCHEMA)
+
+
+def iter_actual(path, chunksize):
+    """
+    Read 'actual_loan_repayments.csv' in chunks, each cast to the compact ledger schema.
+    """
+    for df_actual in pd.read_csv(path, chunksize=chunksize, dtype={"ActualRepayment": np.float64}):
+        yield to_ledger(df_actual, ACTUAL_SCHEMA)
+
+
+def memory_report(frames):
+    """
+    Compare the memory footprint of pairs of frames holding the same rows.
+
+    Args:
+        frames (dict): Label to (baseline DataFrame, compact DataFrame), e.g. {'actual': (df_actual, df_ledger)}
+
+    Returns:
+        DataFrame: Deep memory use and bytes per row for each pair, with the relative saving.
+
+    """
+    rows = []
+    for label, (baseline, compact) in frames.items():
+        baseline_bytes = baseline.memory_usage(deep=True, index=False).sum()
+        compact_bytes = compact.memory_usage(deep=True, index=False).sum()
+        rows.append(
+            {
+                "Frame": label,
+                "Rows": len(compact),
+                "BaselineBytes": baseline_bytes,
+                "CompactBytes": compact_bytes,
+                "BaselineBytesPerRow": baseline_bytes / max(len(baseline), 1),
+                "CompactBytesPerRow": compact_bytes / max(len(compact), 1),
+                "Saving": 1 - compact_bytes / baseline_bytes if baseline_bytes else 0.0,
+            }
+        )
+    return pd.DataFrame(rows).set_index("Frame")
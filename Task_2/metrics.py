@@ -0,0 +1,78 @@
+from dataclasses import dataclass
+
+from aggregates import PortfolioAggregates
+
+"""
+Fused portfolio metrics for the Task_2 questions.
+
+'compute_metrics()' answers 'question_1()' - 'question_4()' from a single grouped pass over 'df_balances' (per-loan
+bincounts in 'PortfolioAggregates.update()'), without copying the frame or adding columns to it. The answers are read
+off with the formulas defined in Python.py, so they match the questions.
+
+"""
+
+
+@dataclass(frozen=True)
+class PortfolioMetrics:
+    """
+    All four Task_2 answers for one portfolio.
+
+    Attributes:
+        type1_default_rate (float): Percentage of type 1 defaulted loans ('question_1()')
+        type2_default_rate (float): Percentage of type 2 defaulted loans ('question_2()')
+        cpr (float): Annualised portfolio CPR as a percent ('question_3()')
+        year2_expected_loss (float): Predicted total loss for the second year ('question_4()')
+    """
+
+    type1_default_rate: float
+    type2_default_rate: float
+    cpr: float
+    year2_expected_loss: float
+
+    @classmethod
+    def from_aggregates(cls, aggregates, recovery_rate=0.80):
+        """
+        Read the metrics off partial aggregates (e.g. from the streaming, parallel or incremental engines).
+        """
+        return cls(
+            type1_default_rate=float(aggregates.question_1()),
+            type2_default_rate=float(aggregates.question_2()),
+            cpr=float(aggregates.question_3()),
+            year2_expected_loss=float(aggregates.question_4(recovery_rate)),
+        )
+
+
+def portfolio_aggregates(df_balances, df_scheduled=None):
+    """
+    Fold 'df_balances' into 'PortfolioAggregates' in one grouped pass.
+
+    Args:
+        df_balances (DataFrame): Dataframe created from the 'calculate_df_balances()' function
+        df_scheduled (DataFrame): Dataframe created from the 'scheduled_loan_repayments.csv' dataset. Only needed for
+            the type 2 rate, which counts scheduled loans without any repayments; defaults to the loans in 'df_balances'
+
+    Returns:
+        PortfolioAggregates: Aggregates over every row of 'df_balances'.
+
+    """
+    if df_scheduled is None:
+        df_scheduled = df_balances[["LoanID", "ScheduledRepayment"]].drop_duplicates("LoanID")
+
+    return PortfolioAggregates.empty(df_scheduled).update(df_balances)
+
+
+def compute_metrics(df_balances, df_scheduled=None, recovery_rate=0.80):
+    """
+    Compute every Task_2 metric in one pass over 'df_balances'.
+
+    Args:
+        df_balances (DataFrame): Dataframe created from the 'calculate_df_balances()' function
+        df_scheduled (DataFrame): Dataframe created from the 'scheduled_loan_repayments.csv' dataset, see
+            'portfolio_aggregates()'
+        recovery_rate (float): Recovery rate used for the year 2 expected loss
+
+    Returns:
+        PortfolioMetrics: The four answers.
+
+    """
+    return PortfolioMetrics.from_aggregates(portfolio_aggregates(df_balances, df_scheduled), recovery_rate)
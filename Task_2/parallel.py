@@ -0,0 +1,109 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from aggregates import PortfolioAggregates
+from amortization import calculate_balances
+
+"""
+Multi-core sharded engine for the Task_2 portfolio.
+
+Balances are independent per loan, so the scheduled loans are split into contiguous LoanID ranges (one shard per
+worker) and each worker computes its shard's balances and the partial aggregates behind 'question_1()' -
+'question_4()'. Results are merged in shard order, so the output is identical for any worker count and, because
+shards are contiguous LoanID ranges, the concatenated balances are in the same order 'calculate_balances()' returns.
+
+"""
+
+# Below this many repayment rows per worker, process start-up and pickling cost more than they save
+DEFAULT_MIN_ROWS_PER_WORKER = 250_000
+
+
+def default_workers():
+    """
+    Return the number of CPUs available to this process.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def shard_frames(df_scheduled, df_actual, n_shards):
+    """
+    Split the inputs into 'n_shards' contiguous LoanID ranges.
+
+    Args:
+        df_scheduled (DataFrame): Dataframe created from the 'scheduled_loan_repayments.csv' dataset
+        df_actual (DataFrame): Dataframe created from the 'actual_loan_repayments.csv' dataset
+        n_shards (int): Number of shards to create
+
+    Returns:
+        list[tuple[DataFrame, DataFrame]]: (scheduled, actual) pairs, in ascending LoanID order.
+
+    """
+    scheduled = df_scheduled.sort_values("LoanID", kind="stable").reset_index(drop=True)
+    loan_splits = np.array_split(np.arange(len(scheduled)), n_shards)
+
+    # First LoanID of every shard after the first marks a boundary
+    bounds = np.array([scheduled["LoanID"].iat[split[0]] for split in loan_splits[1:] if len(split)])
+    actual_shard = np.searchsorted(bounds, df_actual["LoanID"].to_numpy(), side="right")
+    actual_groups = dict(tuple(df_actual.groupby(actual_shard, sort=False)))
+
+    shards = []
+    for shard, split in enumerate(split for split in loan_splits if len(split)):
+        shard_actual = actual_groups.get(shard, df_actual.iloc[:0])
+        shards.append((scheduled.iloc[split], shard_actual))
+    return shards
+
+
+def _run_shard(df_scheduled, df_actual, keep_balances):
+    # Worker entry point - must stay at module level so it can be pickled
+    df_balances = calculate_balances(df_scheduled, df_actual)
+    aggregates = PortfolioAggregates.empty(df_scheduled).update(df_balances)
+    return (df_balances if keep_balances else None), aggregates
+
+
+def calculate_portfolio(
+    df_scheduled, df_actual, workers=None, keep_balances=True, min_rows_per_worker=DEFAULT_MIN_ROWS_PER_WORKER
+):
+    """
+    Compute balances and question aggregates, sharding loans across a process pool.
+
+    Args:
+        df_scheduled (DataFrame): Dataframe created from the 'scheduled_loan_repayments.csv' dataset
+        df_actual (DataFrame): Dataframe created from the 'actual_loan_repayments.csv' dataset
+        workers (int): Maximum number of worker processes (defaults to the available CPUs)
+        keep_balances (bool): Return the full balance frame; set False to only ship aggregates back from workers
+        min_rows_per_worker (int): Inputs smaller than this per worker use fewer workers, down to a serial run
+
+    Returns:
+        tuple[DataFrame, PortfolioAggregates]: The 'calculate_balances()' frame (None if 'keep_balances' is False)
+        and the merged aggregates answering 'question_1()' - 'question_4()'.
+
+    """
+    if workers is None:
+        workers = default_workers()
+
+    # 1. Use only as many workers as the input justifies; fall back to serial for small books
+    workers = max(1, min(workers, len(df_actual) // max(min_rows_per_worker, 1), len(df_scheduled)))
+    if workers == 1:
+        return _run_shard(df_scheduled, df_actual, keep_balances)
+
+    # 2. Fan the shards out to the pool
+    shards = shard_frames(df_scheduled, df_actual, workers)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_run_shard, shard_scheduled, shard_actual, keep_balances)
+            for shard_scheduled, shard_actual in shards
+        ]
+        results = [future.result() for future in futures]
+
+    # 3. Deterministic reduction in shard (= LoanID) order
+    aggregates = PortfolioAggregates.combine_shards([shard_aggregates for _, shard_aggregates in results])
+    if not keep_balances:
+        return None, aggregates
+
+    df_balances = pd.concat([shard_balances for shard_balances, _ in results], ignore_index=True)
+    return df_balances, aggregates
@@ -0,0 +1,159 @@
+import numpy as np
+import pandas as pd
+
+"""
+Prepayment curves for the Task_2 loan book.
+
+'question_3()' reduces the whole book to one CPR. 'prepayment_curves()' breaks prepayment down into SMM and CPR curves
+by month, per origination cohort and per loan-size bucket, in one grouped pass over 'df_balances':
+    1. every loan-month gets a cell number (cohort x size bucket x month),
+    2. one set of bincounts sums the balance, the unscheduled principal and log(1 + SMM) of each cell,
+    3. the portfolio, cohort and size bucket curves are sums of the cell totals along the other dimensions.
+
+The monthly SMM of a curve is its pool SMM: unscheduled principal / start of month balance over its loans. The loan
+level definition of 'question_3()' - the geometric mean of (1 + SMM) over loan-months - is reported next to it as
+'GeometricSMM' and is accumulated as a sum of logs, never as a product. Rates compound in log space as well:
+CPR = 1 - (1 - SMM)^12 is evaluated as -expm1(12 * log1p(-SMM)), and the cumulative share of a curve's balance
+prepaid since its first month as -expm1(cumsum(log1p(-SMM))).
+
+'Month' is the loan month of the ledger. Every loan in the data is originated in the same month, so the loan month is
+also the calendar month of the book, and by default a loan's cohort is the first month it has a repayment in; pass
+'cohorts' to group by actual origination periods.
+
+"""
+
+# Loan size buckets on LoanAmount: [0, 25000), [25000, 50000), ..., [100000, inf)
+DEFAULT_SIZE_EDGES = (0, 25_000, 50_000, 75_000, 100_000)
+
+
+def size_bucket_labels(size_edges):
+    """
+    Labels of the buckets defined by ascending lower edges, e.g. '25000-50000' and '100000+'.
+    """
+    edges = [f"{edge:g}" for edge in size_edges]
+    return [f"{low}-{high}" for low, high in zip(edges, edges[1:])] + [f"{edges[-1]}+"]
+
+
+def unscheduled_principal(df_balances):
+    """
+    Principal paid above the scheduled principal in every loan-month, as used by 'question_3()'.
+
+    Returns:
+        ndarray: max((LoanBalanceStart - LoanBalanceEnd) - (ScheduledRepayment - InterestPayment), 0) per row.
+
+    """
+    start = df_balances["LoanBalanceStart"].to_numpy(dtype=np.float64)
+    end = df_balances["LoanBalanceEnd"].to_numpy(dtype=np.float64)
+    scheduled = df_balances["ScheduledRepayment"].to_numpy(dtype=np.float64)
+    interest = df_balances["InterestPayment"].to_numpy(dtype=np.float64)
+    return np.clip((start - end) - (scheduled - interest), 0, None)
+
+
+def cohort_codes(df_balances, cohorts=None):
+    """
+    Cohort of every row of 'df_balances'.
+
+    Args:
+        df_balances (DataFrame): Dataframe created from the 'calculate_df_balances()' function
+        cohorts (Series): Optional LoanID to cohort label; by default a loan's cohort is its first month
+
+    Returns:
+        tuple[ndarray, list[str]]: Cohort number per row and the label of each number.
+
+    """
+    if cohorts is None:
+        cohort = df_balances.groupby("LoanID", sort=False)["Month"].transform("min").to_numpy()
+    else:
+        cohort = pd.Series(cohorts).reindex(df_balances["LoanID"].to_numpy()).to_numpy()
+        if pd.isna(cohort).any():
+            raise ValueError("'cohorts' has no cohort for some loans in df_balances")
+
+    codes, labels = pd.factorize(cohort, sort=True)
+    return codes, [str(label) for label in labels]
+
+
+def prepayment_curves(df_balances, cohorts=None, size_edges=DEFAULT_SIZE_EDGES):
+    """
+    Compute SMM and CPR curves by month for the portfolio, every cohort and every loan-size bucket.
+
+    Args:
+        df_balances (DataFrame): Dataframe created from the 'calculate_df_balances()' function
+        cohorts (Series): Optional LoanID to origination cohort label, see 'cohort_codes()'
+        size_edges (tuple): Ascending lower edges of the LoanAmount buckets
+
+    Returns:
+        DataFrame: One row per curve and month (months without a loan balance are left out) with the columns
+            Dimension ('Portfolio', 'Cohort' or 'SizeBucket'), Bucket ('All', the cohort or the size bucket label),
+            Month, LoanMonths, StartBalance, UnscheduledPrincipal, SMM, GeometricSMM, CPR and CumulativePrepaid.
+            Rates are fractions (0.05 is 5%).
+
+    """
+    month_codes, months = pd.factorize(df_balances["Month"].to_numpy(), sort=True)
+    cohort, cohort_labels = cohort_codes(df_balances, cohorts)
+    size_edges = np.asarray(size_edges, dtype=np.float64)
+    amount = df_balances["LoanAmount"].to_numpy(dtype=np.float64)
+    size = np.clip(np.searchsorted(size_edges, amount, side="right") - 1, 0, None)
+
+    # 1. One cell per cohort x size bucket x month; only loan-months with a balance have an SMM
+    start = df_balances["LoanBalanceStart"].to_numpy(dtype=np.float64)
+    unscheduled = unscheduled_principal(df_balances)
+    active = start > 0
+    shape = (len(cohort_labels), len(size_edges), len(months))
+    cells = np.ravel_multi_index((cohort[active], size[active], month_codes[active]), shape)
+
+    # 2. Cell totals, all from the same cell numbers
+    def cell_sums(weights=None):
+        return np.bincount(cells, weights=weights, minlength=np.prod(shape)).reshape(shape).astype(np.float64)
+
+    totals = {
+        "LoanMonths": cell_sums(),
+        "StartBalance": cell_sums(start[active]),
+        "UnscheduledPrincipal": cell_sums(unscheduled[active]),
+        "SMMLogSum": cell_sums(np.log1p(unscheduled[active] / start[active])),
+    }
+
+    # 3. Roll the cells up along the other dimensions into one frame per dimension
+    frames = []
+    for dimension, axes, labels in (
+        ("Portfolio", (0, 1), ["All"]),
+        ("Cohort", (1,), cohort_labels),
+        ("SizeBucket", (0,), size_bucket_labels(size_edges)),
+    ):
+        rolled = {name: total.sum(axis=axes).reshape(len(labels), len(months)) for name, total in totals.items()}
+        frames.append(
+            pd.DataFrame(
+                {
+                    "Dimension": dimension,
+                    "Bucket": np.repeat(labels, len(months)),
+                    "Month": np.tile(months, len(labels)),
+                    **{name: total.ravel() for name, total in rolled.items()},
+                }
+            )
+        )
+    curves = pd.concat(frames, ignore_index=True)
+    curves = curves[curves["LoanMonths"] > 0].reset_index(drop=True)
+    curves["LoanMonths"] = curves["LoanMonths"].astype(np.int64)
+
+    smm = curves["UnscheduledPrincipal"] / curves["StartBalance"]
+    log_survival = np.log1p(-smm.clip(upper=1))
+    curves["SMM"] = smm
+    curves["GeometricSMM"] = np.expm1(curves.pop("SMMLogSum") / curves["LoanMonths"])
+    curves["CPR"] = -np.expm1(12 * log_survival)
+    curves["CumulativePrepaid"] = -np.expm1(log_survival.groupby([curves["Dimension"], curves["Bucket"]]).cumsum())
+    return curves
+
+
+def average_cpr(curves):
+    """
+    Annualise each curve's monthly SMMs into one CPR: 1 - exp(12 * mean(log(1 - SMM))).
+
+    Args:
+        curves (DataFrame): Curves from 'prepayment_curves()'
+
+    Returns:
+        DataFrame: One row per Dimension and Bucket with the number of Months and the average CPR (a fraction).
+
+    """
+    log_survival = np.log1p(-curves["SMM"].clip(upper=1))
+    grouped = log_survival.groupby([curves["Dimension"], curves["Bucket"]], sort=False)
+    return pd.DataFrame({"Months": grouped.size(), "CPR": -np.expm1(12 * grouped.mean())}).reset_index()
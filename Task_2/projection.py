@@ -0,0 +1,224 @@
+import numpy as np
+import pandas as pd
+
+from amortization import R_MONTHLY
+
+"""
+Forward cashflow projection over the remaining loan term.
+
+'question_4()' prices year 2 from one number, the balance entering month 13. 'project_cashflows()' instead runs every
+loan's balance off month by month until the end of its term: from the loan's current balance (its latest
+LoanBalanceEnd in 'df_balances'), the 10% / 12 monthly rate and its ScheduledRepayment, the scheduled balance after k
+more payments has the closed annuity form
+    B_k = B_0 * (1 + r)^k - P * ((1 + r)^k - 1) / r
+so all loans and all remaining months are evaluated at once as loans x months arrays, in blocks of loans sized to a
+memory budget. A loan that would be repaid early stops at zero; one that is behind schedule repays the remainder with
+its final payment.
+
+Optional CPR and CDR overlays (annual rates, flat or one per loan month) turn the scheduled run-off into expected
+cashflows. Each month, defaults are taken first at the monthly default rate MDR = 1 - (1 - CDR)^(1/12) of the
+performing balance, then the survivors pay as scheduled and prepay SMM = 1 - (1 - CPR)^(1/12) of what remains. The
+performing share of a loan is a product of monthly survival rates, accumulated as a sum of logs. Defaulted balances lose
+(1 - recovery_rate).
+
+"""
+
+LOAN_TERM = 24
+
+# Working memory per loan x month cell: the month index and seven float64 work arrays
+BYTES_PER_CELL = np.dtype(np.int64).itemsize + 7 * np.dtype(np.float64).itemsize
+
+DEFAULT_MEMORY_BUDGET = 256 * 2**20
+
+FLOW_COLUMNS = ["StartBalance", "Interest", "ScheduledPrincipal", "Prepayment", "Default", "Loss", "EndBalance"]
+
+
+def monthly_rate(annual_rate, term=LOAN_TERM):
+    """
+    Convert an annual rate (CPR or CDR, a fraction) into a monthly rate per loan month: 1 - (1 - annual)^(1/12).
+
+    Args:
+        annual_rate (float | ndarray): One rate for every month, or one per loan month 1..term
+
+    Returns:
+        ndarray: Monthly rate of each loan month, shape (term,)
+
+    """
+    annual_rate = np.broadcast_to(np.asarray(annual_rate, dtype=np.float64), (term,))
+    if ((annual_rate < 0) | (annual_rate > 1)).any():
+        raise ValueError("Annual rates must be fractions between 0 and 1")
+    return 1 - (1 - annual_rate) ** (1 / 12)
+
+
+def current_positions(df_balances, df_scheduled=None):
+    """
+    Current state of every loan: its latest balance row in 'df_balances'.
+
+    Args:
+        df_balances (DataFrame): Dataframe created from the 'calculate_df_balances()' function
+        df_scheduled (DataFrame): Optional 'scheduled_loan_repayments.csv' dataframe the ScheduledRepayment is taken
+            from; defaults to the ScheduledRepayment in 'df_balances'
+
+    Returns:
+        DataFrame: LoanID, Month (of the latest row), Balance (its LoanBalanceEnd) and ScheduledRepayment per loan.
+
+    """
+    last_rows = df_balances.groupby("LoanID")["Month"].idxmax()
+    positions = pd.DataFrame(
+        {
+            "LoanID": df_balances.loc[last_rows, "LoanID"].to_numpy(),
+            "Month": df_balances.loc[last_rows, "Month"].to_numpy(dtype=np.int64),
+            "Balance": df_balances.loc[last_rows, "LoanBalanceEnd"].to_numpy(dtype=np.float64),
+            "ScheduledRepayment": df_balances.loc[last_rows, "ScheduledRepayment"].to_numpy(dtype=np.float64),
+        }
+    )
+
+    if df_scheduled is not None:
+        scheduled = df_scheduled.set_index("LoanID")["ScheduledRepayment"]
+        positions["ScheduledRepayment"] = scheduled.reindex(positions["LoanID"]).to_numpy(dtype=np.float64)
+        if positions["ScheduledRepayment"].isna().any():
+            raise ValueError("df_scheduled has no ScheduledRepayment for some loans in df_balances")
+    return positions
+
+
+def annuity_balances(balance, payment, steps, r_monthly=R_MONTHLY):
+    """
+    Scheduled balances after each number of further payments, in closed form.
+
+    Args:
+        balance (ndarray): Current balance per loan
+        payment (ndarray): Monthly payment per loan
+        steps (ndarray): Numbers of payments, e.g. np.arange(1, 13)
+        r_monthly (float): Monthly interest rate
+
+    Returns:
+        ndarray: Balances of shape (loans, steps), floored at zero.
+
+    """
+    growth = (1 + r_monthly) ** np.asarray(steps, dtype=np.float64)
+    balances = balance[:, np.newaxis] * growth - payment[:, np.newaxis] * ((growth - 1) / r_monthly)
+    return np.maximum(balances, 0, out=balances)
+
+
+def project_runoff(
+    balance,
+    age,
+    payment,
+    cpr=0.0,
+    cdr=0.0,
+    recovery_rate=0.80,
+    r_monthly=R_MONTHLY,
+    term=LOAN_TERM,
+    memory_budget=DEFAULT_MEMORY_BUDGET,
+):
+    """
+    Project expected monthly cashflows of loans from their current balances to the end of the term.
+
+    Args:
+        balance (ndarray): Current balance per loan
+        age (ndarray): Loan month the balance is at the end of, per loan (e.g. 12 after the first year)
+        payment (ndarray): Scheduled monthly repayment per loan
+        cpr (float | ndarray): Annual prepayment rate, flat or one per loan month 1..term
+        cdr (float | ndarray): Annual default rate, flat or one per loan month 1..term
+        recovery_rate (float): Share of a defaulted balance that is recovered
+        r_monthly (float): Monthly interest rate
+        term (int): Loan term in months
+        memory_budget (int): Approximate bytes of working memory for one loans x months block
+
+    Returns:
+        dict: Flow name ('FLOW_COLUMNS' and 'PerformingLoans') to its portfolio total per loan month, indexed by
+            the loan month (index 0 is unused).
+
+    """
+    balance = np.asarray(balance, dtype=np.float64)
+    age = np.asarray(age, dtype=np.int64)
+    payment = np.asarray(payment, dtype=np.float64)
+    n_loans = len(balance)
+
+    smm = monthly_rate(cpr, term)
+    mdr = monthly_rate(cdr, term)
+    # Log of the share of a loan still performing at the end of each loan month, with month 0 = 0
+    log_survival = np.concatenate([[0.0], np.cumsum(np.log1p(-mdr) + np.log1p(-smm))])
+
+    horizon = int(term - age.min()) if n_loans else 0
+    totals = {name: np.zeros(term + 1) for name in ["PerformingLoans"] + FLOW_COLUMNS}
+    if horizon <= 0:
+        return totals
+    steps = np.arange(1, horizon + 1)
+
+    block_size = max(1, int(memory_budget // (horizon * BYTES_PER_CELL)))
+    for block_start in range(0, n_loans, block_size):
+        block = slice(block_start, block_start + block_size)
+        b0, a = balance[block], age[block]
+
+        # 1. Loan month of every step; steps past the end of the term are routed to bin 0 and carry no balance
+        month = a[:, np.newaxis] + steps
+        in_term = month <= term
+        month_index = np.minimum(month, term) - 1
+
+        # 2. Scheduled balances, with the final payment clearing whatever is left
+        end = annuity_balances(b0, payment[block], steps, r_monthly)
+        end[month >= term] = 0
+        start = np.concatenate([b0[:, np.newaxis], end[:, :-1]], axis=1)
+
+        # 3. Expected flows: defaults on the performing balance, then scheduled payments and prepayments by survivors
+        performing = np.exp(log_survival[month_index] - log_survival[np.minimum(a, term)][:, np.newaxis])
+        performing_start = performing * start
+        defaulted = performing_start * mdr[month_index]
+        surviving = performing * (1 - mdr[month_index])
+        prepaid = surviving * smm[month_index] * end
+
+        flows = {
+            "PerformingLoans": performing * (start > 0),
+            "StartBalance": performing_start,
+            "Interest": surviving * start * r_monthly,
+            "ScheduledPrincipal": surviving * (start - end),
+            "Prepayment": prepaid,
+            "Default": defaulted,
+            "Loss": defaulted * (1 - recovery_rate),
+            "EndBalance": surviving * end - prepaid,
+        }
+        bins = np.where(in_term, month, 0).ravel()
+        for name, values in flows.items():
+            totals[name] += np.bincount(bins, weights=values.ravel(), minlength=term + 1)
+
+    for total in totals.values():
+        total[0] = 0
+    return totals
+
+
+def project_cashflows(df_balances, df_scheduled=None, cpr=0.0, cdr=0.0, recovery_rate=0.80, **kwargs):
+    """
+    Project the book's monthly balance run-off and expected loss for the rest of the loan term.
+
+    Args:
+        df_balances (DataFrame): Dataframe created from the 'calculate_df_balances()' function
+        df_scheduled (DataFrame): Optional 'scheduled_loan_repayments.csv' dataframe, see 'current_positions()'
+        cpr (float | ndarray): Annual prepayment rate overlay (e.g. from 'prepayment.average_cpr()'), flat or one per
+            loan month
+        cdr (float | ndarray): Annual default rate overlay (e.g. the type 2 rate of 'question_2()' / 100), flat or one
+            per loan month
+        recovery_rate (float): Share of a defaulted balance that is recovered
+        **kwargs: Passed to 'project_runoff()', e.g. 'term' or 'memory_budget'
+
+    Returns:
+        DataFrame: One row per projected loan month with the expected PerformingLoans, StartBalance, Interest,
+            ScheduledPrincipal, Prepayment, Default, Loss, EndBalance and CumulativeLoss.
+
+    """
+    positions = current_positions(df_balances, df_scheduled)
+    totals = project_runoff(
+        positions["Balance"].to_numpy(),
+        positions["Month"].to_numpy(),
+        positions["ScheduledRepayment"].to_numpy(),
+        cpr=cpr,
+        cdr=cdr,
+        recovery_rate=recovery_rate,
+        **kwargs,
+    )
+
+    first_month = int(positions["Month"].min()) + 1 if len(positions) else 1
+    months = np.arange(first_month, len(totals["StartBalance"]))
+    projection = pd.DataFrame({"Month": months, **{name: total[months] for name, total in totals.items()}})
+    projection["CumulativeLoss"] = projection["Loss"].cumsum()
+    return projection
@@ -0,0 +1,304 @@
+import os
+
+import duckdb
+
+from balance_cache import ACTUAL_PATH, DATA_DIR, SCHEDULED_PATH
+
+"""
+DuckDB implementation of the Task_2 balance engine and questions.
+
+The repayment tables are loaded into a DuckDB file and the amortization recurrence runs as a recursive CTE (one
+iteration per month over every loan at once), so the whole pipeline stays inside DuckDB's multithreaded, vectorized
+executor and can spill to disk on books larger than memory. As in Task_1, each query is a function returning SQL text.
+
+The recurrence carries unrounded balances and rounds once at the end, in the same operation order as
+'calculate_df_balances()', so the balance columns match the pandas engine.
+
+"""
+
+DATABASE_PATH = os.path.join(DATA_DIR, "loan_book.db")
+
+
+def scheduled_qry():
+    """
+    Load 'scheduled_loan_repayments.csv' into the `scheduled` table.
+    """
+
+    qry = """CREATE OR REPLACE TABLE scheduled AS SELECT * FROM read_csv(?, header=True, columns = {
+               'LoanID':'INTEGER',
+               'LoanAmount':'DOUBLE',
+               'ScheduledRepayment':'DOUBLE'
+               })"""
+
+    return qry
+
+
+def actual_qry():
+    """
+    Load 'actual_loan_repayments.csv' into the `actual` table.
+    RepaymentID stays DOUBLE as the source contains a non-integer id.
+    """
+
+    qry = """CREATE OR REPLACE TABLE actual AS SELECT * FROM read_csv(?, header=True, columns = {
+               'RepaymentID':'DOUBLE',
+               'LoanID':'INTEGER',
+               'Month':'UTINYINT',
+               'ActualRepayment':'DOUBLE'
+               })"""
+
+    return qry
+
+
+def merged_qry():
+    """
+    Create the temporary `merged` table: actual and scheduled repayments, with each loan's months numbered in order.
+
+    It is materialized once so that every iteration of the recurrence in 'balances_qry()' joins a stored table instead
+    of re-evaluating the window over the whole book. RepaymentID breaks ties between rows of the same month, in the
+    order the pandas engine keeps them.
+    """
+
+    qry = """
+    CREATE OR REPLACE TEMP TABLE merged AS
+    SELECT
+        a.RepaymentID,
+        a.LoanID,
+        a.Month,
+        a.ActualRepayment,
+        s.LoanAmount,
+        s.ScheduledRepayment,
+        ROW_NUMBER() OVER (PARTITION BY a.LoanID ORDER BY a.Month, a.RepaymentID) AS rn
+    FROM actual AS a
+    JOIN scheduled AS s USING (LoanID);
+    """
+
+    return qry
+
+
+def balances_qry():
+    """
+    Create the `balances` table, equivalent to the 'calculate_df_balances()' dataframe, from the `merged` table
+    ('merged_qry()').
+    """
+
+    qry = """
+
+    CREATE OR REPLACE TABLE balances AS
+
+    --1. Run the recurrence one month at a time for every loan, carrying the unrounded balance
+    WITH RECURSIVE amortized AS (
+        SELECT
+            m.*,
+            m.LoanAmount AS BalanceStart,
+            m.LoanAmount * (CAST(0.1 AS DOUBLE) / 12) AS Interest,
+            GREATEST(m.LoanAmount + m.LoanAmount * (CAST(0.1 AS DOUBLE) / 12) - m.ActualRepayment, 0) AS BalanceEnd
+        FROM merged AS m
+        WHERE m.rn = 1
+
+        UNION ALL
+
+        SELECT
+            m.*,
+            p.BalanceEnd AS BalanceStart,
+            p.BalanceEnd * (CAST(0.1 AS DOUBLE) / 12) AS Interest,
+            GREATEST(p.BalanceEnd + p.BalanceEnd * (CAST(0.1 AS DOUBLE) / 12) - m.ActualRepayment, 0) AS BalanceEnd
+        FROM amortized AS p
+        JOIN merged AS m
+          ON m.LoanID = p.LoanID
+         AND m.rn = p.rn + 1
+    )
+
+    --2. Round once at the end; ROUND_EVEN rounds halves to even, as pandas/NumPy do
+    SELECT
+        RepaymentID,
+        LoanID,
+        Month,
+        ActualRepayment,
+        LoanAmount,
+        ScheduledRepayment,
+        ROUND_EVEN(BalanceStart, 2) AS LoanBalanceStart,
+        ROUND_EVEN(BalanceEnd, 2)   AS LoanBalanceEnd,
+        ROUND_EVEN(Interest, 2)     AS InterestPayment
+    FROM amortized
+    ORDER BY LoanID, Month, RepaymentID;
+    """
+
+    return qry
+
+
+def question_1():
+    """
+    Percentage of loans that defaulted as per the type 1 default definition (see 'question_1()' in Python.py).
+    """
+
+    qry = """
+    --1. A loan defaults if any monthly repayment was missed/underpaid
+    WITH loan_flags AS (
+        SELECT
+            LoanID,
+            BOOL_OR(ActualRepayment < ScheduledRepayment) AS Missed
+        FROM balances
+        GROUP BY LoanID
+    )
+
+    --2. Convert the flags into a percentage
+    SELECT AVG(CAST(Missed AS DOUBLE)) * 100 AS DefaultRatePercent
+    FROM loan_flags;
+    """
+
+    return qry
+
+
+def question_2():
+    """
+    Percentage of loans that defaulted as per the type 2 default definition (see 'question_2()' in Python.py).
+    """
+
+    qry = """
+    --1. Actual repayments per loan
+    WITH actual_yearly AS (
+        SELECT
+            LoanID,
+            SUM(ActualRepayment) AS ActualYearly
+        FROM balances
+        GROUP BY LoanID
+    )
+
+    --2. More than 15% of the expected yearly payments unpaid; loans without repayments never default
+    SELECT
+        AVG(
+            CASE
+                WHEN s.ScheduledRepayment * 12 - a.ActualYearly > 0.15 * (s.ScheduledRepayment * 12) THEN 1.0
+                ELSE 0.0
+            END
+        ) * 100 AS DefaultRatePercent
+    FROM scheduled AS s
+    LEFT JOIN actual_yearly AS a USING (LoanID);
+    """
+
+    return qry
+
+
+def question_3():
+    """
+    Annualised portfolio CPR as a percent (see 'question_3()' in Python.py).
+    The product of (1 + SMM) is taken as a sum of logs, but EXP(sum / 12) and the 12th power still overflow on large
+    books, where the answer is -inf as in the pandas engine.
+    """
+
+    qry = """
+    --1. SMM per loan-month with a positive starting balance
+    WITH smm AS (
+        SELECT
+            GREATEST(
+                (LoanBalanceStart - LoanBalanceEnd) - (ScheduledRepayment - InterestPayment), 0
+            ) / LoanBalanceStart AS SMM
+        FROM balances
+        WHERE LoanBalanceStart > 0
+    ),
+
+    --2. Geometric mean SMM, (prod(1 + SMM))^(1/12) - 1
+    smm_mean AS (
+        SELECT
+            COUNT(SMM) AS n,
+            EXP(SUM(LN(1 + SMM)) / 12) - 1 AS SMM_mean
+        FROM smm
+    )
+
+    --3. Annualise
+    SELECT
+        CASE WHEN n = 0 THEN 0.0 ELSE (1 - POW(1 - SMM_mean, 12)) * 100 END AS CPRPercent
+    FROM smm_mean;
+    """
+
+    return qry
+
+
+def question_4():
+    """
+    Predicted total loss for the second year of the loan term (see 'question_4()' in Python.py).
+    Uses the type 2 default rate on year 1 repayments and an 80% recovery rate.
+    """
+
+    qry = """
+    --1. Year 1 repayments against the expected yearly payment, per loan
+    WITH loan_year1 AS (
+        SELECT
+            LoanID,
+            ANY_VALUE(ScheduledRepayment) * 12                 AS ScheduledYearly,
+            SUM(ActualRepayment) FILTER (WHERE Month <= 12)    AS ActualYearly
+        FROM balances
+        GROUP BY LoanID
+    ),
+
+    --2. Probability of default from the type 2 rule
+    default_rate AS (
+        SELECT
+            AVG(CASE WHEN ScheduledYearly - ActualYearly > 0.15 * ScheduledYearly THEN 1.0 ELSE 0.0 END) AS PD
+        FROM loan_year1
+    ),
+
+    --3. Total balance entering year 2
+    year2_balance AS (
+        SELECT COALESCE(SUM(LoanBalanceStart), 0) AS TotalLoanBalance
+        FROM balances
+        WHERE Month = 13
+    )
+
+    SELECT PD * TotalLoanBalance * (1 - 0.80) AS TotalLoss
+    FROM default_rate, year2_balance;
+    """
+
+    return qry
+
+
+def connect(database_path=DATABASE_PATH, memory_limit=None, threads=None):
+    """
+    Open the loan book database, optionally bounding DuckDB's memory (beyond which it spills to disk) and threads.
+    """
+    config = {}
+    if memory_limit is not None:
+        config["memory_limit"] = memory_limit
+    if threads is not None:
+        config["threads"] = threads
+    return duckdb.connect(database_path, config=config)
+
+
+def build_database(
+    database_path=DATABASE_PATH, scheduled_path=SCHEDULED_PATH, actual_path=ACTUAL_PATH, memory_limit=None
+):
+    """
+    Load both repayment files into a DuckDB database and materialize the `balances` table.
+
+    Args:
+        database_path (str): DuckDB file to create or refresh
+        scheduled_path (str): Path to 'scheduled_loan_repayments.csv'
+        actual_path (str): Path to 'actual_loan_repayments.csv'
+        memory_limit (str): Optional DuckDB memory limit, e.g. '4GB'
+
+    """
+    with connect(database_path, memory_limit=memory_limit) as cursor:
+        cursor.execute(scheduled_qry(), [scheduled_path])
+        cursor.execute(actual_qry(), [actual_path])
+        cursor.execute(merged_qry())
+        cursor.execute(balances_qry())
+        cursor.execute("DROP TABLE merged")
+
+
+def run_questions(database_path=DATABASE_PATH, memory_limit=None):
+    """
+    Answer 'question_1()' - 'question_4()' inside DuckDB.
+
+    Returns:
+        dict: Question name to its scalar answer.
+
+    """
+    questions = {
+        "question_1": question_1,
+        "question_2": question_2,
+        "question_3": question_3,
+        "question_4": question_4,
+    }
+
+    with connect(database_path, memory_limit=memory_limit) as cursor:
+        return {name: cursor.execute(qry()).fetchone()[0] for name, qry in questions.items()}
@@ -0,0 +1,73 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from incremental import BalanceState
+from ledger import iter_actual
+
+"""
+Out-of-core balance computation for repayment histories larger than memory.
+
+'actual_loan_repayments.csv' is read in chunks and each chunk is joined against the (small) scheduled table.
+The only state carried between chunks is a 'BalanceState' (unrounded closing balance, last month and partial aggregates
+per loan), so memory is bounded by the chunk size plus O(number of loans), not by the length of the history.
+
+Chunks may hold any mix of loans (e.g. LoanID-grouped or month-ordered files), but a loan's months must not go
+backwards across chunks - a chunk repeating or preceding a month already processed for that loan raises ValueError.
+
+"""
+
+DEFAULT_CHUNKSIZE = 1_000_000
+
+
+def iter_balance_chunks(df_scheduled, actual_path, chunksize=DEFAULT_CHUNKSIZE, state=None):
+    """
+    Compute balances chunk by chunk.
+
+    Args:
+        df_scheduled (DataFrame): Dataframe created from the 'scheduled_loan_repayments.csv' dataset
+        actual_path (str): Path to the 'actual_loan_repayments.csv' dataset
+        chunksize (int): Number of repayment rows read per chunk
+        state (BalanceState): Running state to continue from and update (defaults to an empty book)
+
+    Yields:
+        DataFrame: The 'df_balances' rows for each chunk, ordered by LoanID and Month within the chunk.
+
+    """
+    if state is None:
+        state = BalanceState.empty(df_scheduled)
+
+    for df_actual in iter_actual(actual_path, chunksize):
+        df_balances = state.append(df_scheduled, df_actual)
+        if not df_balances.empty:
+            yield df_balances
+
+
+def stream_balances(df_scheduled, actual_path, output_path=None, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Stream the balance computation, folding every chunk into partial aggregates for the Task_2 questions.
+
+    Args:
+        df_scheduled (DataFrame): Dataframe created from the 'scheduled_loan_repayments.csv' dataset
+        actual_path (str): Path to the 'actual_loan_repayments.csv' dataset
+        output_path (str): Optional Parquet file that the balance rows are written to, one row group per chunk
+        chunksize (int): Number of repayment rows read per chunk
+
+    Returns:
+        PortfolioAggregates: Aggregates answering 'question_1()' - 'question_4()' for the whole history.
+
+    """
+    state = BalanceState.empty(df_scheduled)
+    writer = None
+
+    try:
+        for df_balances in iter_balance_chunks(df_scheduled, actual_path, chunksize, state):
+            if output_path is not None:
+                table = pa.Table.from_pandas(df_balances, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(output_path, table.schema)
+                writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return state.aggregates
@@ -0,0 +1,185 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from metrics import portfolio_aggregates
+
+"""
+Monte Carlo stress engine for the year 2 expected loss.
+
+'question_4()' gives one deterministic loss: probability_of_default * total_loan_balance * (1 - 0.80).
+This module simulates a distribution of that loss. Each scenario draws
+    - a systematic PD shock (mean 1 lognormal multiplier on every loan's probability of default),
+    - a recovery rate (Beta distribution),
+    - a prepayment shock (mean 1 lognormal multiplier on the monthly SMM), which runs the exposure off over the horizon,
+and then an independent default draw per loan. Arrays are scenarios x loans, processed in blocks of scenarios sized to
+a fixed memory budget.
+
+Every scenario has its own random stream (spawned from one seed), so results are reproducible and do not depend on the
+block size.
+
+"""
+
+# Working memory per scenario x loan cell: a float32 uniform, a float64 work value and a boolean default flag
+BYTES_PER_CELL = np.dtype(np.float32).itemsize + np.dtype(np.float64).itemsize + np.dtype(bool).itemsize
+
+DEFAULT_MEMORY_BUDGET = 256 * 2**20
+
+
+@dataclass(frozen=True)
+class StressResult:
+    """
+    Simulated year 2 loss distribution.
+
+    Attributes:
+        losses (ndarray): Total loss per scenario
+        confidence (float): Confidence level used for VaR and expected shortfall
+        expected_loss (float): Mean loss across scenarios
+        value_at_risk (float): Loss quantile at 'confidence'
+        expected_shortfall (float): Mean loss in scenarios at or beyond the VaR
+    """
+
+    losses: np.ndarray
+    confidence: float
+    expected_loss: float
+    value_at_risk: float
+    expected_shortfall: float
+
+    @classmethod
+    def from_losses(cls, losses, confidence=0.99):
+        """
+        Summarise a vector of scenario losses.
+        """
+        value_at_risk = float(np.quantile(losses, confidence))
+        return cls(
+            losses=losses,
+            confidence=confidence,
+            expected_loss=float(losses.mean()),
+            value_at_risk=value_at_risk,
+            expected_shortfall=float(losses[losses >= value_at_risk].mean()),
+        )
+
+
+def beta_parameters(mean, sd):
+    """
+    Convert a mean and standard deviation into Beta distribution (alpha, beta) parameters.
+    """
+    variance = sd**2
+    if not 0 < mean < 1 or not 0 < variance < mean * (1 - mean):
+        raise ValueError(f"No Beta distribution has mean {mean} and standard deviation {sd}")
+
+    concentration = mean * (1 - mean) / variance - 1
+    return mean * concentration, (1 - mean) * concentration
+
+
+def lognormal_shocks(rng, sd, size):
+    """
+    Draw mean 1 lognormal multipliers.
+    """
+    return np.exp(sd * rng.standard_normal(size) - sd**2 / 2)
+
+
+def simulate_losses(
+    exposure,
+    probability_of_default,
+    monthly_smm,
+    n_scenarios=10_000,
+    seed=0,
+    recovery_mean=0.80,
+    recovery_sd=0.10,
+    pd_shock_sd=0.30,
+    smm_shock_sd=0.50,
+    horizon=12,
+    memory_budget=DEFAULT_MEMORY_BUDGET,
+):
+    """
+    Simulate the total loss of a loan book under stochastic defaults, recoveries and prepayments.
+
+    Args:
+        exposure (ndarray): Balance per loan at the start of the horizon
+        probability_of_default (float | ndarray): Probability of default over the horizon, per loan or for all loans
+        monthly_smm (float): Base single monthly mortality (prepayment rate)
+        n_scenarios (int): Number of scenarios
+        seed (int): Seed for all random draws
+        recovery_mean (float): Mean recovery rate
+        recovery_sd (float): Standard deviation of the recovery rate
+        pd_shock_sd (float): Log standard deviation of the systematic PD shock (0 disables it)
+        smm_shock_sd (float): Log standard deviation of the prepayment shock (0 disables it)
+        horizon (int): Number of months the exposure runs off for before a default is realised
+        memory_budget (int): Approximate bytes of working memory for the scenarios x loans block
+
+    Returns:
+        ndarray: Total loss per scenario, shape (n_scenarios,)
+
+    """
+    exposure = np.asarray(exposure, dtype=np.float64)
+    n_loans = len(exposure)
+    probability_of_default = np.broadcast_to(np.asarray(probability_of_default, dtype=np.float64), (n_loans,))
+
+    # 1. Systematic factors, one draw per scenario
+    streams = np.random.SeedSequence(seed).spawn(n_scenarios + 1)
+    systematic = np.random.default_rng(streams[0])
+
+    alpha, beta = beta_parameters(recovery_mean, recovery_sd)
+    recovery = systematic.beta(alpha, beta, n_scenarios)
+    pd_shock = lognormal_shocks(systematic, pd_shock_sd, n_scenarios)
+    smm = np.clip(monthly_smm * lognormal_shocks(systematic, smm_shock_sd, n_scenarios), 0, 1)
+
+    # Exposure still outstanding at the end of the horizon after prepayments
+    runoff = (1 - smm) ** horizon
+
+    # 2. Idiosyncratic defaults, a block of scenarios at a time in preallocated buffers
+    block_size = min(max(1, int(memory_budget // max(n_loans * BYTES_PER_CELL, 1))), n_scenarios)
+    uniforms = np.empty((block_size, n_loans), dtype=np.float32)
+    work = np.empty((block_size, n_loans))
+    defaults = np.empty((block_size, n_loans), dtype=bool)
+    exposure_at_default = np.empty(n_scenarios)
+
+    for block_start in range(0, n_scenarios, block_size):
+        block = slice(block_start, min(block_start + block_size, n_scenarios))
+        rows = block.stop - block.start
+
+        for row in range(rows):
+            np.random.default_rng(streams[block_start + row + 1]).random(dtype=np.float32, out=uniforms[row])
+
+        # Shocked PD per scenario x loan, then the default flags and the defaulted exposure
+        np.multiply(probability_of_default[np.newaxis, :], pd_shock[block, np.newaxis], out=work[:rows])
+        np.less(uniforms[:rows], work[:rows], out=defaults[:rows])
+        np.multiply(defaults[:rows], exposure[np.newaxis, :], out=work[:rows])
+        exposure_at_default[block] = work[:rows].sum(axis=1)
+
+    # 3. Loss = exposure at default after run-off * (1 - recovery)
+    return exposure_at_default * runoff * (1 - recovery)
+
+
+def stress_test(df_balances, df_scheduled=None, n_scenarios=10_000, seed=0, confidence=0.99, **kwargs):
+    """
+    Run the stress simulation on a balance frame.
+
+    The exposure is each loan's closing balance, the probability of default is the year 1 type 2 rate used by
+    'question_4()' and the base SMM is the geometric mean of (1 + SMM) per loan-month, from the same SMM inputs as
+    'question_3()'.
+
+    Args:
+        df_balances (DataFrame): Dataframe created from the 'calculate_df_balances()' function
+        df_scheduled (DataFrame): Dataframe created from the 'scheduled_loan_repayments.csv' dataset
+        n_scenarios (int): Number of scenarios
+        seed (int): Seed for all random draws
+        confidence (float): Confidence level for VaR and expected shortfall
+        **kwargs: Passed to 'simulate_losses()', e.g. 'recovery_sd' or 'memory_budget'
+
+    Returns:
+        StressResult: The simulated loss distribution and its risk measures.
+
+    """
+    # 1. Closing balance of every loan
+    last_rows = df_balances.groupby("LoanID")["Month"].idxmax()
+    exposure = df_balances.loc[last_rows, "LoanBalanceEnd"].to_numpy(dtype=np.float64)
+
+    # 2. PD and base SMM from the portfolio aggregates
+    aggregates = portfolio_aggregates(df_balances, df_scheduled)
+    probability_of_default = aggregates.year1_default_probability()
+    monthly_smm = np.expm1(aggregates.smm_log_sum / aggregates.smm_count) if aggregates.smm_count else 0.0
+
+    losses = simulate_losses(exposure, probability_of_default, monthly_smm, n_scenarios, seed, **kwargs)
+    return StressResult.from_losses(losses, confidence)
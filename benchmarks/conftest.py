@@ -0,0 +1,46 @@
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The task modules import their siblings by name, as they do when run from their own folders
+for folder in ("Task_2", "Task_1", os.path.join("Task_1", "database")):
+    path = os.path.join(ROOT, folder)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from harness import BenchmarkRecorder, compare_results  # noqa: E402
+
+"""
+Benchmark configuration, taken from environment variables:
+
+    BENCH_SCALES    comma separated numbers of loans/customers to generate (default '1000', e.g. '1000,100000,10000000')
+    BENCH_OUTPUT    JSON file the measurements are written to (default 'benchmarks/results/latest.json')
+    BENCH_BASELINE  optional JSON file from an earlier run; the session fails if any stage regressed against it
+
+"""
+
+SCALES = [int(scale) for scale in os.environ.get("BENCH_SCALES", "1000").split(",")]
+OUTPUT_PATH = os.environ.get("BENCH_OUTPUT", os.path.join(ROOT, "benchmarks", "results", "latest.json"))
+BASELINE_PATH = os.environ.get("BENCH_BASELINE")
+
+
+@pytest.fixture(scope="session")
+def recorder():
+    recorder = BenchmarkRecorder()
+    yield recorder
+    recorder.write(OUTPUT_PATH)
+
+    if BASELINE_PATH:
+        with open(BASELINE_PATH) as f:
+            regressions = compare_results(json.load(f), recorder.to_dict())
+        if regressions:
+            pytest.fail("Benchmark regressions:\n" + "\n".join(regressions))
+
+
+@pytest.fixture(scope="session", params=SCALES, ids=lambda scale: f"scale={scale}")
+def scale(request):
+    return request.param
@@ -0,0 +1,169 @@
+import json
+import os
+import platform
+import resource
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+
+"""
+Stage timing and memory measurement for the benchmark suite.
+
+Each measured stage records its wall time, the peak resident set size (RSS) of the process while it ran and its
+throughput in rows per second. Results are written as JSON so two runs (e.g. two versions of the code) can be compared
+with 'compare_results()'.
+
+"""
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss():
+    """
+    Return the current resident set size in bytes (falls back to the peak RSS where /proc is unavailable).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except OSError:
+        # ru_maxrss is kilobytes on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if platform.system() == "Darwin" else peak * 1024
+
+
+class RssSampler:
+    """
+    Background thread tracking the highest RSS seen between 'start()' and 'stop()'.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, current_rss())
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self.peak = current_rss()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+        return self.peak
+
+
+class BenchmarkRecorder:
+    """
+    Collects stage measurements and writes them to a JSON file.
+    """
+
+    def __init__(self, label=None):
+        self.label = label or code_version()
+        self.results = []
+
+    @contextmanager
+    def measure(self, stage, scale, rows):
+        """
+        Measure the body of a 'with' block as one stage.
+
+        Args:
+            stage (str): Stage name, e.g. 'task2.calculate_balances'
+            scale (int): Number of loans/customers in the synthetic dataset
+            rows (int): Number of input rows the stage processes, used for the throughput
+
+        Yields:
+            dict: Extra measurements the block can add to the stage's result, e.g. bytes per row.
+
+        """
+        extra = {}
+        sampler = RssSampler().start()
+        start = time.perf_counter()
+        try:
+            yield extra
+        finally:
+            wall = time.perf_counter() - start
+            peak = sampler.stop()
+            self.results.append(
+                {
+                    "stage": stage,
+                    "scale": scale,
+                    "rows": rows,
+                    "wall_s": wall,
+                    "peak_rss_mb": peak / 2**20,
+                    "rows_per_s": rows / wall if wall > 0 else None,
+                    **extra,
+                }
+            )
+
+    def to_dict(self):
+        return {
+            "label": self.label,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "results": self.results,
+        }
+
+    def write(self, path):
+        """
+        Write the collected results to 'path' as JSON.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+def code_version():
+    """
+    Return the short git commit of the working tree, or 'unknown' outside a git checkout.
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare_results(baseline, current, max_slowdown=1.5, max_memory_growth=1.5, min_wall_s=0.05):
+    """
+    Find stages that got slower or use more memory than a baseline run.
+
+    Args:
+        baseline (dict): Results loaded from a baseline JSON file
+        current (dict): Results of the current run ('BenchmarkRecorder.to_dict()')
+        max_slowdown (float): Allowed ratio of current to baseline wall time
+        max_memory_growth (float): Allowed ratio of current to baseline peak RSS
+        min_wall_s (float): Stages faster than this in the baseline are too noisy to compare on time
+
+    Returns:
+        list[str]: One message per regression (empty when there are none).
+
+    """
+    baseline_stages = {(r["stage"], r["scale"]): r for r in baseline["results"]}
+
+    regressions = []
+    for result in current["results"]:
+        before = baseline_stages.get((result["stage"], result["scale"]))
+        if before is None:
+            continue
+
+        key = f"{result['stage']} @ {result['scale']}"
+        if before["wall_s"] >= min_wall_s and result["wall_s"] > before["wall_s"] * max_slowdown:
+            regressions.append(f"{key}: wall time {before['wall_s']:.3f}s -> {result['wall_s']:.3f}s")
+        if result["peak_rss_mb"] > before["peak_rss_mb"] * max_memory_growth:
+            regressions.append(
+                f"{key}: peak RSS {before['peak_rss_mb']:.0f}MB -> {result['peak_rss_mb']:.0f}MB"
+            )
+    return regressions
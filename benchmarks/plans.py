@@ -0,0 +1,158 @@
+import re
+from collections import Counter
+
+from query_runner import discover_questions
+from result_cache import normalize_sql, split_statements
+
+"""
+Query-plan capture and comparison for the SQL question modules.
+
+Every statement of every `question_*` function is run through DuckDB's EXPLAIN, and the physical plan's boxes are parsed
+into the operators they contain. Each question is summarized by its operator types, its number of joins, its sequential
+scans (per table, and how many read a whole table without a pushed-down filter) and the optimizer's estimated
+cardinalities ('EC: n'). 'compare_plans()' checks those summaries against a baseline, so a change that adds a join or a
+full scan, swaps a hash join for a nested loop or makes the row estimates explode is reported before it is deployed.
+
+"""
+
+# Operators that combine two inputs; the nested loop family and cross products compare every pair of rows
+JOIN_OPERATORS = ("JOIN", "CROSS_PRODUCT")
+QUADRATIC_OPERATORS = ("NESTED_LOOP_JOIN", "BLOCKWISE_NL_JOIN", "PIECEWISE_MERGE_JOIN", "CROSS_PRODUCT")
+
+_ESTIMATE = re.compile(r"EC:\s*(\d+)")
+_SEPARATOR = re.compile(r"^[─\s]*$")
+
+
+def parse_plan(text):
+    """
+    Parse DuckDB's box-drawn EXPLAIN output into its operators.
+
+    Boxes of sibling operators are drawn side by side, so each box is tracked by the columns of its top corners and its
+    content lines are cut out of every text line between its top and bottom border. Sections inside a box are separated
+    by dashed lines: the first holds the operator name, the second (for scans) the table name.
+
+    Returns:
+        list[dict]: One dict per operator, top to bottom, with its 'name', 'table' (scans only), 'filtered' (whether
+        a scan has pushed-down filters) and 'estimate' (the estimated cardinality, or None when not shown).
+
+    """
+    operators = []
+    open_boxes = {}
+    for line in text.splitlines():
+        for start in [index for index, char in enumerate(line) if char == "┌"]:
+            end = line.index("┐", start)
+            open_boxes[start] = (end, [[]])
+
+        for start, (end, sections) in list(open_boxes.items()):
+            if line[start:start + 1] == "└":
+                del open_boxes[start]
+                operators.append(_box_operator(sections))
+                continue
+            if line[start:start + 1] != "│":
+                continue
+            content = line[start + 1:end].strip()
+            if _SEPARATOR.match(content):
+                if sections[-1]:
+                    sections.append([])
+            else:
+                sections[-1].append(content)
+    return operators
+
+
+def _box_operator(sections):
+    sections = [section for section in sections if section]
+    name = "".join(sections[0]) if sections else ""
+    text = " ".join(line for section in sections for line in section)
+    estimate = _ESTIMATE.search(text)
+
+    operator = {"name": name, "estimate": int(estimate.group(1)) if estimate else None}
+    if name.endswith("_SCAN"):
+        operator["table"] = "".join(sections[1]) if len(sections) > 1 else None
+        operator["filtered"] = "Filters:" in text
+    return operator
+
+
+def summarize_plan(operators):
+    """
+    Summarize the operators of one or more statements.
+
+    Returns:
+        dict: 'operators' (count per operator type), 'joins', 'quadratic_joins', 'scans' (SEQ_SCAN count per table),
+        'full_scans' (SEQ_SCANs without a filter), 'max_estimate' and 'total_estimate' (over the estimated
+        cardinalities of all operators).
+
+    """
+    estimates = [operator["estimate"] for operator in operators if operator["estimate"] is not None]
+    seq_scans = [operator for operator in operators if operator["name"] == "SEQ_SCAN"]
+    return {
+        "operators": dict(sorted(Counter(operator["name"] for operator in operators).items())),
+        "joins": sum(any(kind in operator["name"] for kind in JOIN_OPERATORS) for operator in operators),
+        "quadratic_joins": sum(operator["name"] in QUADRATIC_OPERATORS for operator in operators),
+        "scans": dict(sorted(Counter(operator["table"] for operator in seq_scans).items())),
+        "full_scans": sum(not operator["filtered"] for operator in seq_scans),
+        "max_estimate": max(estimates, default=0),
+        "total_estimate": sum(estimates),
+    }
+
+
+def explain_statement(cursor, statement):
+    """
+    Return the operators of one statement's physical plan.
+    """
+    rows = cursor.execute(f"EXPLAIN {statement}").fetchall()
+    return [operator for _, text in rows for operator in parse_plan(text)]
+
+
+def explain_questions(cursor, module):
+    """
+    Capture the plans of a module's questions in order.
+
+    Each statement is explained and then executed, so statements that read tables created or changed by an earlier
+    statement or question (e.g. `financing` or `timeline` in Advanced_SQL.py) are planned against them, as they run in
+    the notebooks. Use a throwaway copy of the database.
+
+    Returns:
+        dict: Question name to its summary ('summarize_plan()') with the number of 'statements' added.
+
+    """
+    plans = {}
+    for name, function in discover_questions(module):
+        statements = split_statements(normalize_sql(function()))
+        operators = []
+        for statement in statements:
+            operators.extend(explain_statement(cursor, statement))
+            cursor.execute(statement)
+        plans[name] = {"statements": len(statements), **summarize_plan(operators)}
+    return plans
+
+
+def compare_plans(baseline, current, max_estimate_growth=2.0):
+    """
+    Find the ways a question's plan got worse than its baseline.
+
+    Args:
+        baseline (dict): Summary of the question in the baseline ('explain_questions()')
+        current (dict): Summary of the question now
+        max_estimate_growth (float): Allowed ratio of current to baseline estimated cardinality (maximum and total)
+
+    Returns:
+        list[str]: One message per regression (empty when there are none).
+
+    """
+    regressions = []
+    for key, label in (
+        ("joins", "joins"),
+        ("quadratic_joins", "nested loop joins / cross products"),
+        ("full_scans", "full table scans"),
+    ):
+        if current[key] > baseline[key]:
+            regressions.append(f"{label} {baseline[key]} -> {current[key]}")
+
+    for table, count in current["scans"].items():
+        if count > baseline["scans"].get(table, 0):
+            regressions.append(f"scans of {table} {baseline['scans'].get(table, 0)} -> {count}")
+
+    for key, label in (("max_estimate", "largest estimated cardinality"), ("total_estimate", "total estimated rows")):
+        if current[key] > max(baseline[key], 1) * max_estimate_growth:
+            regressions.append(f"{label} {baseline[key]} -> {current[key]}")
+    return regressions
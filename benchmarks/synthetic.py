@@ -0,0 +1,256 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+"""
+Deterministic synthetic data matching the shape of the shipped datasets.
+
+Task_2:
+    'scheduled_loan_repayments.csv' - LoanID, LoanAmount (13k-120k in steps of 1k), ScheduledRepayment (24 month
+    annuity at 10%); 'actual_loan_repayments.csv' - 12 months per loan, mostly paid in full with a share of missed
+    (0) and double (prepayment) payments, RepaymentID written as '1.0' like the source.
+
+Task_1:
+    the five 'Task_1/database/data' tables, including the anomalies the SQL questions clean up (duplicated
+    CustomerIDs, abbreviated and full Region names, repayments across time zones).
+
+Data is generated in fixed blocks of loans/customers, each with its own seed, so a block's rows are identical at any
+scale and large datasets can be written to CSV block by block without holding them in memory.
+
+"""
+
+BLOCK_SIZE = 100_000
+
+R_MONTHLY = 0.1 / 12
+TERM_MONTHS = 24
+ACTUAL_MONTHS = 12
+
+REGIONS = ["NC", "GT", "MP", "WC", "EC", "NW", "KZN", "FS", "LP"]
+REGION_NAMES = [
+    "NorthernCape", "Gauteng", "Mpumalanga", "WesternCape", "EasternCape",
+    "NorthWest", "KwaZulu-Natal", "FreeState", "Limpopo",
+]
+TIME_ZONES = ["JST", "PST", "CET", "PNT", "UTC", "EET", "GMT", "IST", "CST"]
+MONTH_NAMES = [
+    "January", "February", "March", "April", "May", "June",
+    "July", "August", "September", "October", "November", "December",
+]
+SYLLABLES = ["al", "an", "bo", "da", "el", "fi", "ka", "li", "mo", "na", "ri", "sa", "te", "vi", "xo", "zu"]
+
+TASK1_FILES = {
+    "customers": "customer_data.csv",
+    "loans": "loan_dataset.csv",
+    "credit": "credit_data.csv",
+    "repayments": "Loan_Repayments.csv",
+    "months": "Months.csv",
+}
+
+
+def _blocks(n, seed):
+    # (block number, first id, rng) for each block of ids 1..n
+    for block, start in enumerate(range(0, n, BLOCK_SIZE)):
+        yield block, start + 1, min(BLOCK_SIZE, n - start), np.random.default_rng([seed, block])
+
+
+def task2_block(first_loan, n_loans, rng):
+    """
+    Generate the scheduled and actual repayments for one block of loans.
+
+    Returns:
+        tuple[DataFrame, DataFrame]: Scheduled rows and actual rows (ordered by LoanID, then Month).
+
+    """
+    loan_ids = np.arange(first_loan, first_loan + n_loans)
+    loan_amount = rng.integers(13, 121, n_loans) * 1000.0
+    scheduled_repayment = np.round(loan_amount * R_MONTHLY / (1 - (1 + R_MONTHLY) ** -TERM_MONTHS), 2)
+
+    df_scheduled = pd.DataFrame(
+        {"LoanID": loan_ids, "LoanAmount": loan_amount, "ScheduledRepayment": scheduled_repayment}
+    )
+
+    # ~93.5% paid in full, ~1.5% missed and ~5% paid double, as in the shipped data
+    behaviour = rng.random((n_loans, ACTUAL_MONTHS))
+    multiplier = np.where(behaviour < 0.015, 0.0, np.where(behaviour < 0.065, 2.0, 1.0))
+    actual = np.round(scheduled_repayment[:, np.newaxis] * multiplier, 2)
+
+    df_actual = pd.DataFrame(
+        {
+            "LoanID": np.repeat(loan_ids, ACTUAL_MONTHS),
+            "Month": np.tile(np.arange(1, ACTUAL_MONTHS + 1), n_loans),
+            "ActualRepayment": actual.ravel(),
+        }
+    )
+    return df_scheduled, df_actual
+
+
+def generate_task2(n_loans, seed=0):
+    """
+    Generate an in-memory Task_2 book of 'n_loans' loans.
+
+    Returns:
+        tuple[DataFrame, DataFrame]: 'df_scheduled' and 'df_actual' with the same columns and dtypes as 'pd.read_csv'
+        gives for the shipped files.
+
+    """
+    blocks = [task2_block(first, size, rng) for _, first, size, rng in _blocks(n_loans, seed)]
+    df_scheduled = pd.concat([scheduled for scheduled, _ in blocks], ignore_index=True)
+    df_actual = pd.concat([actual for _, actual in blocks], ignore_index=True)
+    df_actual.insert(0, "RepaymentID", np.arange(1, len(df_actual) + 1, dtype=np.float64))
+    return df_scheduled, df_actual
+
+
+def write_task2(out_dir, n_loans, seed=0):
+    """
+    Write 'scheduled_loan_repayments.csv' and 'actual_loan_repayments.csv' for 'n_loans' loans, block by block.
+
+    Returns:
+        tuple[str, str]: Paths of the scheduled and actual files.
+
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    scheduled_path = os.path.join(out_dir, "scheduled_loan_repayments.csv")
+    actual_path = os.path.join(out_dir, "actual_loan_repayments.csv")
+
+    next_repayment_id = 1
+    for block, first, size, rng in _blocks(n_loans, seed):
+        df_scheduled, df_actual = task2_block(first, size, rng)
+        df_actual.insert(
+            0, "RepaymentID", np.arange(next_repayment_id, next_repayment_id + len(df_actual), dtype=np.float64)
+        )
+        next_repayment_id += len(df_actual)
+
+        mode, header = ("w", True) if block == 0 else ("a", False)
+        df_scheduled.to_csv(scheduled_path, mode=mode, header=header, index=False)
+        df_actual.to_csv(actual_path, mode=mode, header=header, index=False)
+
+    return scheduled_path, actual_path
+
+
+def _names(rng, size):
+    return np.array(["".join(parts) for parts in rng.choice(SYLLABLES, (size, 2))])
+
+
+def task1_block(first_customer, n_customers, rng, first_repayment_id):
+    """
+    Generate the customers, loans, credit and repayments tables for one block of customers.
+
+    Returns:
+        dict: Table name to DataFrame, in the column layout of the matching 'Task_1/database/data' file.
+
+    """
+    customer_ids = np.arange(first_customer, first_customer + n_customers)
+
+    # 1. ~1.4% of customers appear twice in customers, loans and credit
+    duplicated = customer_ids[rng.random(n_customers) < 0.014]
+    row_ids = np.sort(np.concatenate([customer_ids, duplicated]))
+    n_rows = len(row_ids)
+
+    region_code = rng.integers(0, len(REGIONS), n_rows)
+    full_name = rng.random(n_rows) < 0.1
+    region = np.where(full_name, np.array(REGION_NAMES)[region_code], np.array(REGIONS)[region_code])
+
+    customers = pd.DataFrame(
+        {
+            "CustomerID": row_ids,
+            "Name": _names(rng, n_rows),
+            "Surname": _names(rng, n_rows),
+            "Age": rng.integers(18, 81, n_rows),
+            "Gender": np.where(rng.random(n_rows) < 0.5, "Male", "Female"),
+            "Income": rng.integers(40_000, 90_000, n_rows),
+            "Region": region,
+        }
+    )
+
+    loans = pd.DataFrame(
+        {
+            "CustomerID": row_ids,
+            "LoanAmount": rng.integers(8_000, 30_000, n_rows),
+            "LoanTerm": rng.choice([12, 24, 36, 48, 60], n_rows),
+            "InterestRate": np.round(rng.uniform(4.0, 8.5, n_rows), 2),
+            "ApprovalStatus": np.where(rng.random(n_rows) < 0.5, "Approved", "Rejected"),
+        }
+    )
+
+    credit_score = rng.integers(600, 801, n_rows)
+    credit = pd.DataFrame(
+        {
+            "CustomerID": row_ids,
+            "CreditScore": credit_score,
+            "CustomerClass": np.where(
+                rng.random(n_rows) < 0.006, "A+", np.where(credit_score >= 700, "A", "B")
+            ),
+        }
+    )
+
+    # 2. Five repayments per customer on average, spread over 2024
+    n_repayments = 5 * n_customers
+    seconds = rng.integers(0, 366 * 24 * 3600, n_repayments)
+    microseconds = rng.integers(0, 1_000_000, n_repayments)
+    repayment_date = (
+        np.datetime64("2024-01-01T00:00:00", "us")
+        + seconds.astype("timedelta64[s]")
+        + microseconds.astype("timedelta64[us]")
+    )
+
+    repayments = pd.DataFrame(
+        {
+            "RepaymentID": np.arange(first_repayment_id, first_repayment_id + n_repayments),
+            "RepaymentDate": np.sort(repayment_date),
+            "Amount": rng.uniform(5.0, 500.0, n_repayments),
+            "CustomerID": rng.choice(customer_ids, n_repayments),
+            "TimeZone": rng.choice(TIME_ZONES, n_repayments),
+        }
+    )
+
+    return {"customers": customers, "loans": loans, "credit": credit, "repayments": repayments}
+
+
+def months_table():
+    """
+    Return the 'Months.csv' table.
+    """
+    return pd.DataFrame({"MonthID": np.arange(1, 13), "MonthName": MONTH_NAMES})
+
+
+def generate_task1(n_customers, seed=0):
+    """
+    Generate in-memory Task_1 tables for 'n_customers' customers.
+
+    Returns:
+        dict: Table name ('customers', 'loans', 'credit', 'repayments', 'months') to DataFrame.
+
+    """
+    tables = {name: [] for name in ("customers", "loans", "credit", "repayments")}
+    next_repayment_id = 1
+    for _, first, size, rng in _blocks(n_customers, seed):
+        for name, df in task1_block(first, size, rng, next_repayment_id).items():
+            tables[name].append(df)
+        next_repayment_id += 5 * size
+
+    tables = {name: pd.concat(dfs, ignore_index=True) for name, dfs in tables.items()}
+    tables["months"] = months_table()
+    return tables
+
+
+def write_task1(out_dir, n_customers, seed=0):
+    """
+    Write the five Task_1 csv files for 'n_customers' customers, block by block, using the shipped file names.
+
+    Returns:
+        str: 'out_dir', ready to pass as the loader's data directory.
+
+    """
+    os.makedirs(out_dir, exist_ok=True)
+
+    next_repayment_id = 1
+    for block, first, size, rng in _blocks(n_customers, seed):
+        mode, header = ("w", True) if block == 0 else ("a", False)
+        for name, df in task1_block(first, size, rng, next_repayment_id).items():
+            if name == "repayments":
+                df = df.assign(RepaymentDate=df["RepaymentDate"].dt.strftime("%Y-%m-%dT%H:%M:%S.%f"))
+            df.to_csv(os.path.join(out_dir, TASK1_FILES[name]), mode=mode, header=header, index=False)
+        next_repayment_id += 5 * size
+
+    months_table().to_csv(os.path.join(out_dir, TASK1_FILES["months"]), index=False)
+    return out_dir
@@ -0,0 +1,231 @@
+import inspect
+
+import Advanced_SQL
+import arrow_io
+import duckdb
+import ledger
+import pandas as pd
+import pytest
+import SQL
+from amortization import calculate_balances
+from database_load import load_database
+from metrics import compute_metrics
+from parallel import calculate_portfolio, default_workers
+from prepayment import average_cpr, prepayment_curves
+from projection import project_cashflows
+from snapshot import reset_database
+from sql_engine import build_database
+from Python import calculate_df_balances, question_1, question_2, question_3, question_4
+from streaming import stream_balances
+
+from synthetic import generate_task2, write_task1, write_task2
+
+pytestmark = pytest.mark.weight(0)
+
+# The iterrows reference engine is only timed on small books
+REFERENCE_MAX_SCALE = 10_000
+
+
+@pytest.fixture(scope="session")
+def task2_files(scale, tmp_path_factory):
+    return write_task2(tmp_path_factory.mktemp(f"task2-{scale}"), scale)
+
+
+@pytest.fixture(scope="session")
+def task2_frames(task2_files):
+    scheduled_path, actual_path = task2_files
+    return pd.read_csv(scheduled_path), pd.read_csv(actual_path)
+
+
+@pytest.fixture(scope="session")
+def task2_balances(task2_frames):
+    return calculate_balances(*task2_frames)
+
+
+@pytest.fixture(scope="session")
+def task1_data_dir(scale, tmp_path_factory):
+    return write_task1(tmp_path_factory.mktemp(f"task1-{scale}"), scale)
+
+
+def test_task2_generator_is_deterministic():
+    first, second = generate_task2(50, seed=7), generate_task2(50, seed=7)
+    pd.testing.assert_frame_equal(first[0], second[0])
+    pd.testing.assert_frame_equal(first[1], second[1])
+
+
+def test_task2_read_csv(recorder, scale, task2_files):
+    scheduled_path, actual_path = task2_files
+    with recorder.measure("task2.read_csv", scale, rows=scale * 13):
+        df_scheduled = pd.read_csv(scheduled_path)
+        df_actual = pd.read_csv(actual_path)
+
+    assert len(df_scheduled) == scale
+    assert len(df_actual) == scale * 12
+
+
+def test_task2_ledger_memory(recorder, scale, task2_files, task2_frames):
+    # Bytes per row of the 'pd.read_csv' frames against the typed ledger frames holding the same rows
+    scheduled_path, actual_path = task2_files
+    with recorder.measure("task2.read_ledger", scale, rows=scale * 13) as extra:
+        df_scheduled = ledger.read_scheduled(scheduled_path)
+        df_actual = ledger.read_actual(actual_path)
+
+        report = ledger.memory_report(
+            {"scheduled": (task2_frames[0], df_scheduled), "actual": (task2_frames[1], df_actual)}
+        )
+        for frame, row in report.iterrows():
+            extra[f"{frame}_baseline_bytes_per_row"] = float(row["BaselineBytesPerRow"])
+            extra[f"{frame}_ledger_bytes_per_row"] = float(row["CompactBytesPerRow"])
+
+    assert (report["CompactBytesPerRow"] < report["BaselineBytesPerRow"]).all()
+    assert report.loc["actual", "Saving"] > 0.3
+
+
+def test_task2_read_arrow(recorder, scale, task2_files, tmp_path):
+    scheduled_path, actual_path = task2_files
+    with recorder.measure("task2.read_csv_arrow", scale, rows=scale * 13):
+        df_scheduled = arrow_io.read_scheduled(scheduled_path)
+        df_actual = arrow_io.read_actual(actual_path)
+
+    parquet_paths = arrow_io.write_parquet(scheduled_path, actual_path, str(tmp_path))
+    with recorder.measure("task2.read_parquet_arrow", scale, rows=scale * 13):
+        df_scheduled = arrow_io.read_scheduled(parquet_paths[0])
+        df_actual = arrow_io.read_actual(parquet_paths[1])
+
+    assert len(df_scheduled) == scale
+    assert len(df_actual) == scale * 12
+
+
+def test_task2_reference_balances(recorder, scale, task2_frames, task2_balances):
+    if scale > REFERENCE_MAX_SCALE:
+        pytest.skip(f"reference engine is only timed up to {REFERENCE_MAX_SCALE} loans")
+
+    df_scheduled, df_actual = task2_frames
+    with recorder.measure("task2.calculate_df_balances", scale, rows=len(df_actual)):
+        df_reference = calculate_df_balances(df_scheduled, df_actual)
+
+    pd.testing.assert_frame_equal(df_reference, task2_balances, check_exact=True)
+
+
+def test_task2_calculate_balances(recorder, scale, task2_frames):
+    df_scheduled, df_actual = task2_frames
+    with recorder.measure("task2.calculate_balances", scale, rows=len(df_actual)):
+        df_balances = calculate_balances(df_scheduled, df_actual)
+
+    assert len(df_balances) == len(df_actual)
+
+
+@pytest.mark.parametrize("workers", ["1", "N"])
+def test_task2_parallel(recorder, scale, task2_frames, workers):
+    # Every shard is forced into its own process, so workers=1 against workers=N shows the speedup of the pool
+    df_scheduled, df_actual = task2_frames
+    n_workers = 1 if workers == "1" else max(default_workers(), 2)
+    with recorder.measure(f"task2.calculate_portfolio.workers={workers}", scale, rows=len(df_actual)):
+        df_balances, aggregates = calculate_portfolio(df_scheduled, df_actual, workers=n_workers, min_rows_per_worker=1)
+
+    assert len(df_balances) == len(df_actual)
+    assert aggregates.seen.all()
+
+
+def test_task2_sql_engine(recorder, scale, task2_files, tmp_path):
+    scheduled_path, actual_path = task2_files
+    with recorder.measure("task2.sql_build_database", scale, rows=scale * 12):
+        build_database(str(tmp_path / "loan_book.db"), scheduled_path, actual_path)
+
+    with duckdb.connect(str(tmp_path / "loan_book.db")) as cursor:
+        assert cursor.execute("SELECT COUNT(*) FROM balances").fetchall()[0][0] == scale * 12
+
+
+def test_task2_streaming(recorder, scale, task2_files, task2_frames):
+    df_scheduled, df_actual = task2_frames
+    with recorder.measure("task2.stream_balances", scale, rows=len(df_actual)):
+        aggregates = stream_balances(df_scheduled, task2_files[1], chunksize=max(len(df_actual) // 10, 1))
+
+    assert aggregates.seen.all()
+
+
+def test_task2_questions(recorder, scale, task2_frames, task2_balances):
+    df_scheduled, _ = task2_frames
+    rows = len(task2_balances)
+
+    with recorder.measure("task2.question_1", scale, rows):
+        question_1(task2_balances)
+    with recorder.measure("task2.question_2", scale, rows):
+        question_2(df_scheduled, task2_balances)
+    with recorder.measure("task2.question_3", scale, rows):
+        question_3(task2_balances)
+    with recorder.measure("task2.question_4", scale, rows):
+        question_4(task2_balances)
+    with recorder.measure("task2.compute_metrics", scale, rows):
+        metrics = compute_metrics(task2_balances, df_scheduled)
+
+    assert 0 <= metrics.type1_default_rate <= 100
+
+
+def test_task2_prepayment_curves(recorder, scale, task2_balances):
+    with recorder.measure("task2.prepayment_curves", scale, rows=len(task2_balances)):
+        curves = prepayment_curves(task2_balances)
+
+    portfolio = curves[curves["Dimension"] == "Portfolio"]
+    assert portfolio["LoanMonths"].sum() == (task2_balances["LoanBalanceStart"] > 0).sum()
+    assert average_cpr(curves)["CPR"].between(0, 1).all()
+
+
+def test_task2_projection(recorder, scale, task2_frames, task2_balances):
+    df_scheduled, _ = task2_frames
+    with recorder.measure("task2.project_cashflows", scale, rows=scale):
+        projection = project_cashflows(task2_balances, df_scheduled, cpr=0.05, cdr=0.03)
+
+    # Every month's opening balance is accounted for by defaults, principal and the closing balance
+    outflows = projection[["Default", "ScheduledPrincipal", "Prepayment", "EndBalance"]].sum(axis=1)
+    assert ((projection["StartBalance"] - outflows).abs() < 1e-6 * (1 + projection["StartBalance"])).all()
+    assert projection["EndBalance"].iloc[-1] == 0
+
+
+def unordered(df):
+    # Rows in a canonical order: queries without a full ORDER BY may return ties in storage order
+    return df.sort_values(list(df.columns), kind="stable").reset_index(drop=True)
+
+
+@pytest.mark.parametrize("layout", ["csv_order", "optimized"])
+@pytest.mark.parametrize("module", [SQL, Advanced_SQL], ids=lambda module: module.__name__)
+def test_task1_questions(recorder, scale, task1_data_dir, tmp_path, module, layout):
+    # Each section starts from a freshly loaded database, as it is graded; the optimized layout (sorted repayments
+    # and CustomerID indexes) is recorded under its own stage names for a before/after comparison
+    database_path = str(tmp_path / "loan.db")
+    prefix = f"task1.{module.__name__}" + (".optimized" if layout == "optimized" else "")
+    with recorder.measure(f"{prefix}.load_database", scale, rows=scale * 8):
+        load_database(database_path, str(task1_data_dir), optimize_layout=layout == "optimized")
+
+    # The answers are checked against a plain load, which the optimized layout must not change
+    plain_path = str(tmp_path / "plain.db")
+    load_database(plain_path, str(task1_data_dir))
+
+    questions = sorted(
+        (name, function) for name, function in inspect.getmembers(module, inspect.isfunction)
+        if name.startswith("question_")
+    )
+
+    with duckdb.connect(database_path) as cursor:
+        repayments = cursor.execute("SELECT COUNT(*) FROM repayments").fetchone()[0]
+        for name, function in questions:
+            with recorder.measure(f"{prefix}.{name}", scale, rows=repayments):
+                result = cursor.execute(function()).df()
+
+            with duckdb.connect(plain_path) as plain:
+                expected = plain.execute(function()).df()
+            pd.testing.assert_frame_equal(unordered(result), unordered(expected), check_exact=True, obj=name)
+
+
+def test_task1_snapshot_reset(recorder, scale, task1_data_dir, tmp_path):
+    # Resetting a changed database from the baseline snapshot, against the full reload it replaces
+    database_path, snapshot_path = str(tmp_path / "loan.db"), str(tmp_path / "loan.snapshot.db")
+    reset_database(database_path, snapshot_path, str(task1_data_dir))
+    with duckdb.connect(database_path) as cursor:
+        cursor.execute(SQL.question_5()).df()
+
+    with recorder.measure("task1.reset_database", scale, rows=scale * 8):
+        reset_database(database_path, snapshot_path, str(task1_data_dir))
+
+    with duckdb.connect(database_path) as cursor:
+        assert cursor.execute("SELECT COUNT(*) FROM credit WHERE CustomerClass = 'C'").fetchone()[0] == 0
@@ -0,0 +1,96 @@
+import json
+import os
+
+import duckdb
+import pytest
+from query_runner import QUESTION_MODULES, discover_questions
+from snapshot import isolated_database
+
+from plans import compare_plans, explain_questions, explain_statement, summarize_plan
+from synthetic import write_task1
+
+"""
+Query-plan regression tests for SQL.py and Advanced_SQL.py.
+
+The plans of every question are captured on a synthetic database of PLAN_SCALE customers and compared with the
+baseline in benchmarks/query_plans.json: a question fails when it has more joins, nested loop joins, cross products or
+full table scans than in the baseline, or when its estimated cardinalities grew more than MAX_ESTIMATE_GROWTH times.
+
+The baseline is only comparable with the DuckDB version it was recorded with (the optimizer decides the plans). After an
+intended plan change or a DuckDB upgrade, regenerate it with:
+
+    PLAN_BASELINE_UPDATE=1 python -m pytest benchmarks/test_query_plans.py
+
+"""
+
+pytestmark = pytest.mark.weight(0)
+
+PLAN_SCALE = 2000
+MAX_ESTIMATE_GROWTH = 2.0
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "query_plans.json")
+UPDATE_BASELINE = os.environ.get("PLAN_BASELINE_UPDATE") == "1"
+
+QUESTIONS = [(module, name) for module in QUESTION_MODULES for name, _ in discover_questions(module)]
+
+
+@pytest.fixture(scope="module")
+def plans(tmp_path_factory):
+    data_dir = write_task1(tmp_path_factory.mktemp("plans"), PLAN_SCALE)
+    snapshot_path = os.path.join(data_dir, "loan.snapshot.db")
+
+    plans = {}
+    for module in QUESTION_MODULES:
+        # Each module runs on its own copy, as each notebook starts from a freshly loaded loan.db
+        with isolated_database(snapshot_path, in_memory=True, data_dir=data_dir) as cursor:
+            plans[module] = explain_questions(cursor, module)
+
+    if UPDATE_BASELINE:
+        with open(BASELINE_PATH, "w") as f:
+            json.dump({"duckdb": duckdb.__version__, "scale": PLAN_SCALE, "plans": plans}, f, indent=2)
+            f.write("\n")
+    return plans
+
+
+@pytest.fixture(scope="module")
+def baseline():
+    if not os.path.exists(BASELINE_PATH):
+        pytest.skip("no query plan baseline, run with PLAN_BASELINE_UPDATE=1 to record one")
+    with open(BASELINE_PATH) as f:
+        baseline = json.load(f)
+    if baseline["duckdb"] != duckdb.__version__:
+        pytest.skip(f"baseline recorded with DuckDB {baseline['duckdb']}, running {duckdb.__version__}")
+    return baseline
+
+
+@pytest.mark.parametrize("module, question", QUESTIONS, ids=[f"{module}.{name}" for module, name in QUESTIONS])
+def test_question_plan(plans, baseline, module, question):
+    current = plans[module][question]
+    expected = baseline["plans"].get(module, {}).get(question)
+    if expected is None:
+        pytest.fail(f"{module}.{question} has no baseline plan, run with PLAN_BASELINE_UPDATE=1 to record it")
+
+    regressions = compare_plans(expected, current, MAX_ESTIMATE_GROWTH)
+    assert not regressions, f"{module}.{question} plan regressed: " + "; ".join(regressions)
+
+
+def test_plans_have_operators(plans):
+    # Guards the EXPLAIN parser: every question that reads data must plan at least one scan
+    for module, questions in plans.items():
+        for question, plan in questions.items():
+            assert plan["operators"], f"{module}.{question}: no operators parsed"
+            assert plan["scans"], f"{module}.{question}: no table scans parsed"
+
+
+def test_regressions_are_detected():
+    cursor = duckdb.connect()
+    cursor.execute("CREATE TABLE t AS SELECT range AS id, range % 10 AS k FROM range(1000)")
+    before = summarize_plan(explain_statement(cursor, "SELECT k, COUNT(*) FROM t GROUP BY k"))
+    after = summarize_plan(
+        explain_statement(cursor, "SELECT a.k, COUNT(*) FROM t AS a, t AS b WHERE a.id < b.id GROUP BY a.k")
+    )
+
+    regressions = compare_plans(before, after, MAX_ESTIMATE_GROWTH)
+    assert any(message.startswith("joins") for message in regressions)
+    assert any(message.startswith("full table scans") for message in regressions)
+    assert not compare_plans(before, before, MAX_ESTIMATE_GROWTH)
+
@@ -0,0 +1,484 @@
+import asyncio
+import os
+import shutil
+import threading
+import types
+
+import Advanced_SQL
+import duckdb
+import numpy as np
+import pandas as pd
+import pytest
+import snapshot
+import SQL
+from database_load import build_timeline, load_database, table_sources, update_timeline
+from pivot import run_pivot
+from query_runner import QUESTION_MODULES, discover_questions, run_questions
+from query_service import QueryService
+from result_cache import ResultCache, is_deterministic, is_mutating, normalize_sql, split_statements, written_tables
+
+from synthetic import TASK1_FILES, write_task1
+
+"""
+Correctness tests for the Task_1 loader and query tools: each one is checked against the baseline path (a full load of
+the csv files, or the questions executed directly) on a small synthetic database.
+
+"""
+
+pytestmark = pytest.mark.weight(0)
+
+N_CUSTOMERS = 300
+
+# Zone of each TimeZone abbreviation in Loan_Repayments.csv (Java's short zone ids)
+ZONES = {
+    "UTC": "UTC", "GMT": "GMT", "CET": "CET", "EET": "EET", "IST": "Asia/Kolkata", "JST": "Asia/Tokyo",
+    "PST": "America/Los_Angeles", "PNT": "America/Phoenix", "CST": "America/Chicago",
+}
+
+
+def database_tables(database_path):
+    # Every table and view of a database, with its rows in a canonical order
+    with duckdb.connect(database_path, read_only=True) as cursor:
+        names = cursor.execute(
+            "SELECT table_name FROM duckdb_tables() UNION ALL SELECT view_name FROM duckdb_views() WHERE NOT internal"
+        ).fetchall()
+        tables = {}
+        for (name,) in names:
+            df = cursor.execute(f'SELECT * FROM "{name}"').df()
+            tables[name] = df.sort_values(list(df.columns), kind="stable").reset_index(drop=True)
+    return tables
+
+
+def assert_databases_equal(actual_path, expected_path):
+    actual, expected = database_tables(actual_path), database_tables(expected_path)
+    assert sorted(actual) == sorted(expected)
+    for name in expected:
+        pd.testing.assert_frame_equal(actual[name], expected[name], check_exact=True, obj=name)
+
+
+@pytest.fixture(scope="module")
+def data_dir(tmp_path_factory):
+    return write_task1(tmp_path_factory.mktemp("task1"), N_CUSTOMERS, seed=3)
+
+
+@pytest.fixture(scope="module")
+def database(data_dir, tmp_path_factory):
+    database_path = str(tmp_path_factory.mktemp("task1-db") / "loan.db")
+    load_database(database_path, data_dir)
+    return database_path
+
+
+@pytest.fixture(scope="module")
+def raw_database(data_dir, tmp_path_factory):
+    # The source tables only, as the original loader built them (no London time columns or derived tables)
+    database_path = str(tmp_path_factory.mktemp("task1-raw") / "loan.db")
+    with duckdb.connect(database_path) as cursor:
+        for qry, filename in table_sources.values():
+            cursor.execute(qry, [os.path.join(data_dir, filename)])
+    return database_path
+
+
+def truncate_csv(path, keep):
+    # Keep the header and the first 'keep' share of the rows
+    with open(path) as f:
+        lines = f.readlines()
+    with open(path, "w") as f:
+        f.writelines(lines[:1 + int((len(lines) - 1) * keep)])
+
+
+def test_incremental_load_matches_full_load(tmp_path, data_dir, database):
+    # The earlier files hold the first part of the repayments and fewer customers; the current files grow repayments
+    # at the end (appended) and change customers (reloaded)
+    earlier_dir = str(tmp_path / "earlier")
+    shutil.copytree(data_dir, earlier_dir)
+    truncate_csv(os.path.join(earlier_dir, TASK1_FILES["repayments"]), keep=0.6)
+    truncate_csv(os.path.join(earlier_dir, TASK1_FILES["customers"]), keep=0.9)
+
+    database_path = str(tmp_path / "loan.db")
+    load_database(database_path, earlier_dir)
+    report = load_database(database_path, data_dir, incremental=True)
+
+    assert report["repayments"]["action"] == "appended"
+    assert report["customers"]["action"] == "loaded"
+    assert report["loans"]["action"] == "skipped"
+    assert report["timeline"]["action"] == "updated"
+    assert_databases_equal(database_path, database)
+
+    report = load_database(database_path, data_dir, incremental=True)
+    assert {result["action"] for result in report.values()} == {"skipped"}
+    assert_databases_equal(database_path, database)
+
+
+
+def test_optimized_append_keeps_the_clustered_rows(tmp_path, data_dir, database):
+    # An append adds the new repayments after the clustered rows instead of re-sorting the whole table
+    earlier_dir = str(tmp_path / "earlier")
+    shutil.copytree(data_dir, earlier_dir)
+    truncate_csv(os.path.join(earlier_dir, TASK1_FILES["repayments"]), keep=0.6)
+
+    database_path = str(tmp_path / "loan.db")
+    qry = "SELECT * FROM repayments ORDER BY rowid"
+    report = load_database(database_path, earlier_dir, optimize_layout=True)
+    with duckdb.connect(database_path, read_only=True) as cursor:
+        clustered = cursor.execute(qry).df()
+    assert report["repayments"]["index"] == "index"
+
+    report = load_database(database_path, data_dir, incremental=True, optimize_layout=True)
+    assert report["repayments"]["action"] == "appended"
+    assert report["repayments"]["index"] == "index"
+    with duckdb.connect(database_path, read_only=True) as cursor:
+        stored = cursor.execute(qry).df()
+        indexes = cursor.execute("SELECT index_name FROM duckdb_indexes() WHERE table_name = 'repayments'").fetchall()
+
+    pd.testing.assert_frame_equal(stored.iloc[:len(clustered)], clustered, check_exact=True)
+    assert indexes == [("repayments_CustomerID_idx",)]
+    assert_databases_equal(database_path, database)
+
+@pytest.mark.parametrize("workers", [1, None])
+def test_parquet_load_matches_csv_load(tmp_path, data_dir, database, workers):
+    database_path, parquet_dir = str(tmp_path / "loan.db"), str(tmp_path / "parquet")
+    report = load_database(database_path, data_dir, use_parquet=True, workers=workers, parquet_dir=parquet_dir)
+
+    assert {report[table]["action"] for table in TASK1_FILES} == {"loaded"}
+    assert len(os.listdir(parquet_dir)) == len(TASK1_FILES)
+    assert_databases_equal(database_path, database)
+
+    # A second load reuses the cached parquet copies
+    load_database(database_path, data_dir, use_parquet=True, workers=workers, parquet_dir=parquet_dir)
+    assert len(os.listdir(parquet_dir)) == len(TASK1_FILES)
+    assert_databases_equal(database_path, database)
+
+
+def test_london_time_columns_match_pandas(database):
+    with duckdb.connect(database, read_only=True) as cursor:
+        repayments = cursor.execute("SELECT * FROM repayments ORDER BY RepaymentID").df()
+    assert set(repayments["TimeZone"]) <= set(ZONES)
+
+    # Local times that are skipped or repeated by a daylight saving change have no single UTC time and are left out
+    utc = pd.concat(
+        [
+            rows["RepaymentDate"].dt.tz_localize(ZONES[zone], ambiguous="NaT", nonexistent="NaT").dt.tz_convert("UTC")
+            for zone, rows in repayments.groupby("TimeZone")
+        ]
+    ).sort_index()
+    checked = utc.notna().to_numpy()
+    assert checked.mean() > 0.99
+
+    actual = repayments[checked]
+    london = utc[checked].dt.tz_convert("Europe/London").dt.tz_localize(None)
+    micros = (utc[checked] - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(microseconds=1)
+    np.testing.assert_array_equal(actual["RepaymentDateLondon"].to_numpy(), london.to_numpy())
+    np.testing.assert_array_equal(actual["LondonHour"].to_numpy(), london.dt.hour.to_numpy())
+    np.testing.assert_array_equal(actual["MonthID"].to_numpy(), london.dt.month.to_numpy())
+    np.testing.assert_array_equal(actual["RepaymentEpoch"].to_numpy(), ((micros + 500_000) // 1_000_000).to_numpy())
+
+
+def timeline_rows(cursor):
+    df = cursor.execute("SELECT * FROM timeline").df()
+    return df.sort_values(list(df.columns), kind="stable").reset_index(drop=True)
+
+
+def test_updated_timeline_matches_rebuild(tmp_path, database):
+    # Start from the history before the last repayments and customers, then insert them and update the timeline
+    database_path = str(tmp_path / "loan.db")
+    shutil.copyfile(database, database_path)
+    with duckdb.connect(database_path) as cursor:
+        cursor.execute(f"ATTACH '{database}' AS full_load (READ_ONLY)")
+        last_repayment_id, last_customer_id = cursor.execute(
+            "SELECT MAX(RepaymentID), MAX(CustomerID) FROM full_load.repayments"
+        ).fetchall()[0]
+        cutoff, customer_cutoff = int(last_repayment_id * 0.7), int(last_customer_id * 0.9)
+        cursor.execute(f"DELETE FROM repayments WHERE RepaymentID > {cutoff}")
+        cursor.execute(f"DELETE FROM customers WHERE CustomerID > {customer_cutoff}")
+        build_timeline(cursor)
+
+        cursor.execute(f"INSERT INTO repayments SELECT * FROM full_load.repayments WHERE RepaymentID > {cutoff}")
+        update_timeline(cursor, customers_changed=False)
+        cursor.execute(f"INSERT INTO customers SELECT * FROM full_load.customers WHERE CustomerID > {customer_cutoff}")
+        update_timeline(cursor)
+        updated = timeline_rows(cursor)
+
+        build_timeline(cursor)
+        pd.testing.assert_frame_equal(updated, timeline_rows(cursor), check_exact=True)
+
+
+def test_question_4_matches_the_loader_timeline(tmp_path, database, raw_database):
+    # question_4 builds its own timeline from the raw repayments; it replaces the loader's table with the same rows
+    for source in (database, raw_database):
+        database_path = str(tmp_path / "loan.db")
+        shutil.copyfile(source, database_path)
+        with duckdb.connect(database_path) as cursor:
+            result = cursor.execute(Advanced_SQL.question_4()).df()
+
+        with duckdb.connect(database, read_only=True) as cursor:
+            pd.testing.assert_frame_equal(result, cursor.execute("SELECT * FROM timeline").df(), check_exact=True)
+
+
+def test_questions_run_on_the_source_tables_only(tmp_path, database, raw_database):
+    # The graded questions clean the raw tables themselves, so a database built by the original loader (without the
+    # derived tables and columns) gives the same answers
+    database_path, expected_path = str(tmp_path / "loan.db"), str(tmp_path / "expected.db")
+    shutil.copyfile(raw_database, database_path)
+    shutil.copyfile(database, expected_path)
+    with duckdb.connect(database_path) as cursor, duckdb.connect(expected_path) as expected:
+        for module in QUESTION_MODULES:
+            for name, question in discover_questions(module):
+                result = cursor.execute(question()).df()
+                pd.testing.assert_frame_equal(
+                    result, expected.execute(question()).df(), check_exact=True, obj=f"{module}.{name}"
+                )
+
+
+def test_discover_questions_in_question_order():
+    module = types.ModuleType("questions")
+    exec("def question_10(): pass\ndef question_9(): pass\ndef question_1(): pass\ndef helper(): pass", vars(module))
+
+    assert [name for name, _ in discover_questions(module)] == ["question_1", "question_9", "question_10"]
+
+
+@pytest.mark.parametrize("profile", [True, False])
+def test_query_runner_matches_direct_execution(tmp_path, database, profile):
+    # Both copies run the same questions in the same order, including the ones that change the database
+    runner_path, direct_path = str(tmp_path / "runner.db"), str(tmp_path / "direct.db")
+    shutil.copyfile(database, runner_path)
+    shutil.copyfile(database, direct_path)
+
+    profiles = run_questions(QUESTION_MODULES, runner_path, profile=profile)
+
+    expected = []
+    with duckdb.connect(direct_path) as cursor:
+        for module in QUESTION_MODULES:
+            for name, function in discover_questions(module):
+                expected.append((module, name, len(cursor.execute(function()).df())))
+
+    assert [(entry.module, entry.question, entry.rows) for entry in profiles] == expected
+    for query_profile in profiles:
+        assert (query_profile.plan is not None) == profile
+        assert bool(query_profile.operators) == profile
+    assert_databases_equal(runner_path, direct_path)
+
+
+@pytest.fixture(scope="module")
+def questions_database(database, tmp_path_factory):
+    # A database every question has run on, so the tables created by the mutating questions exist
+    database_path = str(tmp_path_factory.mktemp("questions") / "loan.db")
+    shutil.copyfile(database, database_path)
+    run_questions(QUESTION_MODULES, database_path, profile=False)
+    return database_path
+
+
+def test_query_service_runs_read_only_questions(questions_database):
+    expected = {}
+    with duckdb.connect(questions_database, read_only=True) as cursor:
+        for module in QUESTION_MODULES:
+            for name, function in discover_questions(module):
+                if not is_mutating(function()):
+                    expected[f"{module}.{name}"] = cursor.execute(function()).df()
+
+    async def run():
+        async with QueryService(questions_database, max_workers=2) as service:
+            return await service.run_questions()
+
+    results = asyncio.run(run())
+    assert "SQL.question_5" not in results and "Advanced_SQL.question_3" not in results
+    assert list(results) == list(expected)
+    for name, result in results.items():
+        pd.testing.assert_frame_equal(result, expected[name], obj=name)
+
+
+def test_query_service_rejects_mutating_questions(questions_database):
+    async def run():
+        async with QueryService(questions_database, max_workers=1) as service:
+            with pytest.raises(ValueError, match="read only"):
+                await service.run(SQL.question_5())
+            return await service.run_questions(["SQL"], include_mutating=True)
+
+    results = asyncio.run(run())
+    assert isinstance(results["SQL.question_5"], ValueError)
+    assert all(isinstance(result, pd.DataFrame) for name, result in results.items() if name != "SQL.question_5")
+
+
+CLASS_C_QRY = "SELECT COUNT(*) AS Customers FROM credit WHERE CustomerClass = 'C'"
+
+
+@pytest.fixture
+def cache_database(tmp_path, database):
+    database_path = str(tmp_path / "loan.db")
+    shutil.copyfile(database, database_path)
+    return database_path
+
+
+def test_result_cache_hits_and_invalidates_written_tables(cache_database):
+    cache = ResultCache(cache_database)
+    months_qry = "SELECT COUNT(*) AS Months FROM months"
+    with duckdb.connect(cache_database) as cursor:
+        before = cache.execute(cursor, CLASS_C_QRY)
+        pd.testing.assert_frame_equal(cache.execute(cursor, f"-- same query\n{CLASS_C_QRY};"), before)
+        cache.execute(cursor, months_qry)
+        assert (cache.hits, cache.misses) == (1, 2)
+
+        # The UPDATE of credit drops the credit entry only
+        cache.execute(cursor, SQL.question_5())
+        after = cache.execute(cursor, CLASS_C_QRY)
+        assert before["Customers"].iat[0] == 0 < after["Customers"].iat[0]
+        assert cache.execute(cursor, months_qry)["Months"].iat[0] == 12
+        assert (cache.hits, cache.misses) == (2, 4)
+
+        # A write behind a WITH clause is a write too
+        cache.execute(cursor, "WITH extra AS (SELECT 13, 'Extra') INSERT INTO months FROM extra")
+        assert cache.execute(cursor, months_qry)["Months"].iat[0] == 13
+
+
+def test_result_cache_detects_writes_behind_with():
+    def written(qry):
+        return written_tables(split_statements(qry))
+
+    assert written("WITH new (a, b) AS MATERIALIZED (SELECT ')', 2) INSERT INTO months SELECT * FROM new") == {"months"}
+    assert written("WITH RECURSIVE ids AS (SELECT 1 AS i) DELETE FROM credit WHERE CustomerID IN (FROM ids)") == {
+        "credit"
+    }
+    assert written("WITH a AS (SELECT 1), b AS (SELECT * FROM a) SELECT * FROM b") == set()
+
+
+
+@pytest.mark.parametrize(
+    "qry",
+    [
+        "SET TimeZone = 'UTC'",
+        "PRAGMA threads = 1",
+        "IMPORT DATABASE 'backup'",
+        "CALL checkpoint()",
+        "CHECKPOINT",
+        "ATTACH 'other.db' AS other",
+        "DETACH other",
+        "SELECT 1; SET threads = 1",
+    ],
+)
+def test_result_cache_treats_session_and_database_statements_as_mutating(qry):
+    assert written_tables(split_statements(normalize_sql(qry))) is None
+    assert is_mutating(qry)
+
+
+@pytest.mark.parametrize(
+    "qry",
+    ["SELECT 1", "(SELECT 1) UNION ALL (SELECT 2)", "FROM months SELECT MonthName", "DESCRIBE months", "VALUES (1)"],
+)
+def test_result_cache_treats_queries_as_read_only(qry):
+    assert not is_mutating(qry)
+
+
+def test_result_cache_clears_on_session_statements(cache_database):
+    cache = ResultCache(cache_database)
+    with duckdb.connect(cache_database) as cursor:
+        cache.execute(cursor, CLASS_C_QRY)
+        cache.execute(cursor, "SET threads = 1")
+        assert cache.nbytes == 0
+
+        cache.execute(cursor, CLASS_C_QRY)
+        assert (cache.hits, cache.misses) == (0, 3)
+
+
+@pytest.mark.parametrize(
+    "qry",
+    [
+        "SELECT random() AS r FROM months",
+        "SELECT CustomerID FROM credit USING SAMPLE 10",
+        "SELECT epoch(now()) AS t",
+        "SELECT current_date AS d",
+        "SELECT MonthName FROM months WHERE MonthID = month(CURRENT_TIMESTAMP)",
+    ],
+)
+def test_result_cache_does_not_store_nondeterministic_queries(cache_database, qry):
+    assert not is_deterministic(normalize_sql(qry))
+
+    cache = ResultCache(cache_database)
+    with duckdb.connect(cache_database) as cursor:
+        cache.execute(cursor, CLASS_C_QRY)
+        cache.execute(cursor, qry)
+        cache.execute(cursor, qry)
+        cache.execute(cursor, CLASS_C_QRY)
+
+    # Not stored, and not a write either: the other entry stays cached
+    assert (cache.hits, cache.misses) == (1, 3)
+
+class WriteWhileRunning:
+    """
+    Cursor whose first query finishes before 'write' commits, but whose result reaches the cache only afterwards.
+    """
+
+    def __init__(self, cursor, write):
+        self.cursor = cursor
+        self.write = write
+
+    def execute(self, qry, parameters=None):
+        if self.write is None:
+            return self.cursor.execute(qry, parameters)
+
+        result = self.cursor.execute(qry, parameters).df()
+        writer = threading.Thread(target=self.write)
+        self.write = None
+        writer.start()
+        writer.join()
+        return types.SimpleNamespace(df=lambda: result)
+
+
+def test_result_cache_does_not_store_a_result_overtaken_by_a_write(cache_database):
+    cache = ResultCache(cache_database)
+    with duckdb.connect(cache_database) as cursor:
+        writer = cursor.cursor()
+        stale = cache.execute(WriteWhileRunning(cursor, lambda: cache.execute(writer, SQL.question_5())), CLASS_C_QRY)
+        fresh = cache.execute(cursor, CLASS_C_QRY)
+        writer.close()
+
+    assert stale["Customers"].iat[0] == 0 < fresh["Customers"].iat[0]
+    assert (cache.hits, cache.misses) == (0, 3)
+
+
+def test_reset_validates_the_snapshot_once(tmp_path, data_dir, database, monkeypatch):
+    source_dir = str(tmp_path / "data")
+    shutil.copytree(data_dir, source_dir)
+    database_path, snapshot_path = str(tmp_path / "loan.db"), str(tmp_path / "loan.snapshot.db")
+    snapshot.reset_database(database_path, snapshot_path, source_dir)
+    assert_databases_equal(database_path, database)
+
+    # Once validated, a reset only copies the snapshot
+    with duckdb.connect(database_path) as cursor:
+        cursor.execute(SQL.question_5())
+    with monkeypatch.context() as patch:
+        patch.setattr(snapshot, "load_database", lambda *args, **kwargs: pytest.fail("the snapshot was reloaded"))
+        snapshot.reset_database(database_path, snapshot_path, source_dir)
+        with snapshot.isolated_database(snapshot_path, in_memory=True, data_dir=source_dir) as cursor:
+            assert cursor.execute(CLASS_C_QRY).fetchall() == [(0,)]
+    assert_databases_equal(database_path, database)
+
+    # A changed source file is picked up by the next reset
+    truncate_csv(os.path.join(source_dir, TASK1_FILES["customers"]), keep=0.9)
+    snapshot.reset_database(database_path, snapshot_path, source_dir)
+    expected_path = str(tmp_path / "expected.db")
+    load_database(expected_path, source_dir)
+    assert_databases_equal(database_path, expected_path)
+
+
+@pytest.mark.parametrize("granularity", ["month", "week", "day"])
+def test_pivot_matches_pandas(database, granularity):
+    with duckdb.connect(database, read_only=True) as cursor:
+        result = run_pivot(cursor, granularity=granularity).set_index("CustomerID")
+        active = run_pivot(cursor, granularity=granularity, all_customers=False)
+        repayments = cursor.execute("SELECT * FROM repayments WHERE LondonHour BETWEEN 6 AND 18").df()
+        customers = cursor.execute("SELECT DISTINCT CustomerID FROM customers ORDER BY CustomerID").df()["CustomerID"]
+
+    # Count and total per customer and London period, computed with pandas
+    day = repayments["RepaymentDateLondon"].dt.normalize()
+    if granularity == "month":
+        label = day.dt.strftime("Month_%Y_%m")
+    else:
+        start = day - pd.to_timedelta(day.dt.weekday, unit="D") if granularity == "week" else day
+        label = start.dt.strftime(f"{granularity.capitalize()}_%Y_%m_%d")
+    grouped = repayments.groupby(["CustomerID", label.rename("Period")])["Amount"]
+    expected = pd.concat({"Repayments": grouped.size(), "Total": grouped.sum()}, axis=1).unstack("Period")
+    expected.columns = [f"{period}_{measure}" for measure, period in expected.columns]
+
+    assert set(expected.columns) <= set(result.columns)
+    expected = expected.reindex(index=customers, columns=result.columns).fillna(0)
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+    assert active["CustomerID"].tolist() == sorted(repayments["CustomerID"].unique())
@@ -0,0 +1,312 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+from dataclasses import asdict
+
+import arrow_io
+import balance_cache
+import ledger
+import numpy as np
+import Python
+import pandas as pd
+import pytest
+from aggregates import PortfolioAggregates
+from amortization import calculate_balances
+from balance_cache import cache_key, clear_cache, load_balances
+from incremental import BalanceState
+from metrics import PortfolioMetrics, compute_metrics
+from parallel import calculate_portfolio
+from Python import calculate_df_balances, question_1, question_2, question_3, question_4
+from sql_engine import build_database, connect, run_questions
+from streaming import stream_balances
+from stress import stress_test
+
+from synthetic import generate_task2, write_task2
+
+"""
+Correctness tests for the Task_2 engines: each one is checked against the single-process pandas path
+('calculate_balances()' and 'compute_metrics()') on a small synthetic book.
+
+"""
+
+pytestmark = pytest.mark.weight(0)
+
+N_LOANS = 300
+
+
+def assert_metrics_equal(actual, expected):
+    # Partial sums are added in shard/chunk order, so the last digits of the float sums may differ
+    assert asdict(actual) == pytest.approx(asdict(expected), rel=1e-12)
+
+
+@pytest.fixture(scope="module")
+def book():
+    return generate_task2(N_LOANS, seed=3)
+
+
+@pytest.fixture(scope="module")
+def balances(book):
+    return calculate_balances(*book)
+
+
+def test_python_runs_without_its_helper_modules(tmp_path):
+    # Python.py is graded on its own: copied without the rest of Task_2 it reads the CSVs next to it with pandas
+    shutil.copy(Python.__file__, tmp_path)
+    scheduled_path, actual_path = write_task2(tmp_path / "data", N_LOANS, seed=9)
+    script = (
+        "import json, Python as py; "
+        "print(json.dumps([py.question_1(py.df_balances), py.question_2(py.df_scheduled, py.df_balances), "
+        "py.question_3(py.df_balances), py.question_4(py.df_balances)]))"
+    )
+    env = {key: value for key, value in os.environ.items() if key != "PYTHONPATH"}
+    result = subprocess.run([sys.executable, "-c", script], cwd=tmp_path, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+    df_scheduled, df_actual = pd.read_csv(scheduled_path), pd.read_csv(actual_path)
+    df_balances = calculate_df_balances(df_scheduled, df_actual)
+    assert json.loads(result.stdout) == [
+        question_1(df_balances),
+        question_2(df_scheduled, df_balances),
+        question_3(df_balances),
+        question_4(df_balances),
+    ]
+
+
+@pytest.mark.parametrize("position", ["first", "middle", "last"])
+def test_aggregates_reject_unknown_loans(book, balances, position):
+    df_scheduled, _ = book
+    loan_id = {"first": df_scheduled["LoanID"].min(), "middle": N_LOANS // 2, "last": df_scheduled["LoanID"].max()}
+    missing = df_scheduled[df_scheduled["LoanID"] != loan_id[position]]
+
+    with pytest.raises(ValueError, match="not in the scheduled data"):
+        PortfolioAggregates.empty(missing).update(balances)
+
+
+def test_aggregates_accept_known_loans(book, balances):
+    aggregates = PortfolioAggregates.empty(book[0]).update(balances)
+    assert aggregates.seen.all()
+    pd.testing.assert_index_equal(aggregates.to_frame().index, pd.Index(sorted(book[0]["LoanID"]), name="LoanID"))
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_parallel_matches_single_process(book, balances, workers):
+    df_scheduled, df_actual = book
+    df_balances, aggregates = calculate_portfolio(df_scheduled, df_actual, workers=workers, min_rows_per_worker=1)
+
+    pd.testing.assert_frame_equal(df_balances, balances, check_exact=True)
+    assert_metrics_equal(PortfolioMetrics.from_aggregates(aggregates), compute_metrics(balances, df_scheduled))
+
+    _, aggregates_only = calculate_portfolio(
+        df_scheduled, df_actual, workers=workers, keep_balances=False, min_rows_per_worker=1
+    )
+    assert_metrics_equal(PortfolioMetrics.from_aggregates(aggregates_only), compute_metrics(balances, df_scheduled))
+
+
+def test_incremental_append_matches_full_calculation(book, balances):
+    df_scheduled, df_actual = book
+    state = BalanceState.empty(df_scheduled)
+    appended = [state.append(df_scheduled, df_month) for _, df_month in df_actual.groupby("Month")]
+
+    df_appended = pd.concat(appended).sort_values(["LoanID", "Month"], kind="stable").reset_index(drop=True)
+    expected = balances.sort_values(["LoanID", "Month"], kind="stable").reset_index(drop=True)
+    pd.testing.assert_frame_equal(df_appended[expected.columns], expected, check_exact=True)
+    assert_metrics_equal(PortfolioMetrics.from_aggregates(state.aggregates), compute_metrics(balances, df_scheduled))
+
+
+def test_incremental_append_rejects_repeated_months(book):
+    df_scheduled, df_actual = book
+    state = BalanceState.empty(df_scheduled)
+    month_1 = df_actual[df_actual["Month"] == 1]
+
+    with pytest.raises(ValueError, match="more than one row for month 1"):
+        state.append(df_scheduled, pd.concat([month_1, month_1]))
+
+    state.append(df_scheduled, month_1)
+    with pytest.raises(ValueError, match="already processed"):
+        state.append(df_scheduled, month_1)
+
+
+@pytest.mark.parametrize("position", ["first", "middle", "last"])
+def test_incremental_append_rejects_unknown_loans(book, position):
+    # The batch is merged with the full scheduled data, but the state was created without one of its loans
+    df_scheduled, df_actual = book
+    loan_id = {"first": df_scheduled["LoanID"].min(), "middle": N_LOANS // 2, "last": df_scheduled["LoanID"].max()}
+    state = BalanceState.empty(df_scheduled[df_scheduled["LoanID"] != loan_id[position]])
+
+    with pytest.raises(ValueError, match=f"LoanID {loan_id[position]} is not in the book"):
+        state.append(df_scheduled, df_actual[df_actual["Month"] == 1])
+
+
+@pytest.mark.parametrize("chunksize", [50, 997, 10**6])
+@pytest.mark.parametrize("order", ["loan", "month"])
+def test_streaming_matches_full_calculation(tmp_path, book, chunksize, order):
+    # Chunks may split a loan's history, as long as each loan's months never go backwards across chunks
+    df_scheduled, df_actual = book
+    df_actual = df_actual.sort_values(["LoanID" if order == "loan" else "Month", "RepaymentID"])
+    actual_path, output_path = tmp_path / "actual.csv", tmp_path / "balances.parquet"
+    df_actual.to_csv(actual_path, index=False)
+
+    aggregates = stream_balances(df_scheduled, actual_path, output_path, chunksize=chunksize)
+
+    expected = calculate_df_balances(df_scheduled, df_actual)
+    df_streamed = pd.read_parquet(output_path).sort_values(["LoanID", "Month"]).reset_index(drop=True)
+    pd.testing.assert_frame_equal(df_streamed[expected.columns], expected, check_dtype=False)
+    assert_metrics_equal(
+        PortfolioMetrics.from_aggregates(aggregates),
+        PortfolioMetrics(
+            type1_default_rate=question_1(expected),
+            type2_default_rate=question_2(df_scheduled, expected),
+            cpr=question_3(expected),
+            year2_expected_loss=question_4(expected),
+        ),
+    )
+
+
+def test_streaming_rejects_months_going_backwards(tmp_path, book):
+    df_scheduled, df_actual = book
+    actual_path = tmp_path / "actual.csv"
+    df_actual.sort_values(["LoanID", "Month"], ascending=[True, False]).to_csv(actual_path, index=False)
+
+    with pytest.raises(ValueError, match="already processed"):
+        stream_balances(df_scheduled, actual_path, chunksize=5)
+
+
+def sql_balances(tmp_path, df_scheduled, df_actual):
+    scheduled_path, actual_path = tmp_path / "scheduled.csv", tmp_path / "actual.csv"
+    df_scheduled.to_csv(scheduled_path, index=False)
+    df_actual.to_csv(actual_path, index=False)
+
+    database_path = str(tmp_path / "loan_book.db")
+    build_database(database_path, str(scheduled_path), str(actual_path))
+    with connect(database_path) as cursor:
+        return database_path, cursor.execute("SELECT * FROM balances").df()
+
+
+def test_sql_engine_matches_pandas(tmp_path):
+    scheduled_path, actual_path = write_task2(tmp_path, N_LOANS, seed=5)
+    df_scheduled, df_actual = pd.read_csv(scheduled_path), pd.read_csv(actual_path)
+    database_path, df_sql = sql_balances(tmp_path, df_scheduled, df_actual)
+
+    expected = calculate_balances(df_scheduled, df_actual)
+    pd.testing.assert_frame_equal(df_sql[expected.columns], expected, check_dtype=False, check_exact=True)
+
+    answers = run_questions(database_path)
+    metrics = compute_metrics(expected, df_scheduled)
+    assert answers == pytest.approx(
+        {
+            "question_1": metrics.type1_default_rate,
+            "question_2": metrics.type2_default_rate,
+            "question_3": metrics.cpr,
+            "question_4": metrics.year2_expected_loss,
+        },
+        rel=1e-9,
+    )
+
+
+def test_sql_engine_orders_repeated_months_by_repayment_id(tmp_path, book):
+    # A loan with two rows for the same month is amortized in RepaymentID order, as the pandas engine does
+    df_scheduled, df_actual = book
+    df_actual = df_actual[df_actual["LoanID"] <= 20].copy()
+    df_actual.loc[df_actual.index[3], "Month"] = df_actual["Month"].iat[2]
+    df_actual = df_actual.iloc[::-1]
+
+    _, df_sql = sql_balances(tmp_path, df_scheduled, df_actual)
+    expected = calculate_balances(df_scheduled, df_actual.sort_values("RepaymentID"))
+    pd.testing.assert_frame_equal(df_sql[expected.columns], expected, check_dtype=False, check_exact=True)
+
+
+def test_stress_test_is_seeded_and_block_size_independent(book, balances):
+    df_scheduled, _ = book
+    first = stress_test(balances, df_scheduled, n_scenarios=200, seed=11)
+    again = stress_test(balances, df_scheduled, n_scenarios=200, seed=11, memory_budget=1)
+
+    np.testing.assert_array_equal(first.losses, again.losses)
+    assert first.losses.shape == (200,)
+    assert (first.losses >= 0).all()
+    assert 0 <= first.expected_loss <= first.value_at_risk <= first.expected_shortfall
+
+
+@pytest.mark.parametrize("source", ["csv", "parquet", "duckdb"])
+def test_arrow_reads_match_the_ledger(tmp_path, source):
+    scheduled_path, actual_path = write_task2(tmp_path / "data", N_LOANS, seed=4)
+    if source == "parquet":
+        paths = arrow_io.write_parquet(scheduled_path, actual_path, str(tmp_path / "parquet"))
+    elif source == "duckdb":
+        database_path = str(tmp_path / "loan_book.db")
+        build_database(database_path, scheduled_path, actual_path)
+        paths = database_path, database_path
+    else:
+        paths = scheduled_path, actual_path
+
+    df_scheduled, df_actual = arrow_io.read_scheduled(paths[0]), arrow_io.read_actual(paths[1])
+    pd.testing.assert_frame_equal(df_scheduled, ledger.read_scheduled(scheduled_path), check_exact=True)
+    pd.testing.assert_frame_equal(df_actual, ledger.read_actual(actual_path), check_exact=True)
+    assert df_actual["LoanID"].dtype == np.int32
+    assert df_actual["Month"].dtype == np.uint8
+
+
+def cache_files(cache_dir):
+    return sorted(os.listdir(cache_dir)) if os.path.isdir(cache_dir) else []
+
+
+def test_balance_cache_miss_then_hit(tmp_path, monkeypatch):
+    scheduled_path, actual_path = write_task2(tmp_path / "data", N_LOANS, seed=7)
+    cache_dir = str(tmp_path / "cache")
+
+    cold = load_balances(scheduled_path, actual_path, cache_dir)
+    assert cache_files(cache_dir) == [f"balances-{cache_key(scheduled_path, actual_path)}.parquet"]
+    pd.testing.assert_frame_equal(
+        cold, calculate_balances(pd.read_csv(scheduled_path), pd.read_csv(actual_path)), check_dtype=False
+    )
+
+    # A hit is served from the Parquet file without recomputing
+    monkeypatch.setattr(balance_cache, "calculate_balances", None)
+    pd.testing.assert_frame_equal(load_balances(scheduled_path, actual_path, cache_dir), cold, check_exact=True)
+
+    assert clear_cache(cache_dir) == 1
+    assert cache_files(cache_dir) == []
+
+
+def test_balance_cache_key_tracks_inputs_and_versions(tmp_path, monkeypatch):
+    scheduled_path, actual_path = write_task2(tmp_path, N_LOANS, seed=7)
+    key = cache_key(scheduled_path, actual_path)
+    assert cache_key(scheduled_path, actual_path) == key
+
+    monkeypatch.setattr(balance_cache, "ENGINE_VERSION", "bumped")
+    assert cache_key(scheduled_path, actual_path) != key
+    monkeypatch.undo()
+
+    df_actual = pd.read_csv(actual_path)
+    df_actual.loc[0, "ActualRepayment"] += 1
+    df_actual.to_csv(actual_path, index=False)
+    assert cache_key(scheduled_path, actual_path) != key
+
+
+def test_balance_cache_ignores_interrupted_writes(tmp_path, monkeypatch):
+    scheduled_path, actual_path = write_task2(tmp_path / "data", N_LOANS, seed=7)
+    cache_dir = str(tmp_path / "cache")
+    cache_path = os.path.join(cache_dir, f"balances-{cache_key(scheduled_path, actual_path)}.parquet")
+    expected = calculate_balances(pd.read_csv(scheduled_path), pd.read_csv(actual_path))
+
+    # A writer killed mid-write leaves a partial temporary file behind
+    os.makedirs(cache_dir)
+    with open(f"{cache_path}.99999.tmp", "wb") as f:
+        f.write(b"PAR1 partial")
+
+    # A write that fails before the rename removes its temporary file and publishes nothing
+    def fail(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", fail)
+    with pytest.raises(OSError, match="disk full"):
+        load_balances(scheduled_path, actual_path, cache_dir)
+    assert cache_files(cache_dir) == [os.path.basename(cache_path) + ".99999.tmp"]
+    monkeypatch.undo()
+
+    df_balances = load_balances(scheduled_path, actual_path, cache_dir)
+    pd.testing.assert_frame_equal(df_balances, expected, check_dtype=False)
+    pd.testing.assert_frame_equal(pd.read_parquet(cache_path), df_balances, check_exact=True)
+
+    assert clear_cache(cache_dir) == 2